@@ -0,0 +1,50 @@
+"""Measure `codegen.to_source` throughput on a generated module.
+
+Usage: python benchmarks/codegen_benchmark.py [LINES] [REPEAT]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mutpy import codegen, utils  # noqa: E402
+
+FUNCTION_TEMPLATE = '''
+def function_{number}(x, y={number}):
+    """Docstring of function {number}."""
+    result = x * y + {number}
+    if result > 10 and not x:
+        result -= 1
+    for item in range(y):
+        result += item % 3
+    return [result, x ** 2, -y]
+'''
+
+
+def generate_module(lines):
+    functions = []
+    number = 0
+    while len(functions) * FUNCTION_TEMPLATE.count('\n') < lines:
+        functions.append(FUNCTION_TEMPLATE.format(number=number))
+        number += 1
+    return ''.join(functions)
+
+
+def main(argv):
+    lines = int(argv[1]) if len(argv) > 1 else 5000
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    source = generate_module(lines)
+    node = utils.create_ast(source)
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        codegen.to_source(node)
+        durations.append(time.perf_counter() - start)
+    best = min(durations)
+    print('to_source: {} lines in {:.4f} s ({:.0f} lines/s, best of {})'.format(
+        source.count('\n'), best, source.count('\n') / best, repeat))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,76 @@
+import hashlib
+import pickle
+import sqlite3
+import time
+
+DEFAULT_CACHE_SIZE = 100 * 1024 * 1024
+
+
+class ResultsCache:
+    COMMIT_INTERVAL = 100
+
+    def __init__(self, path, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, result BLOB, duration REAL, size INTEGER, accessed REAL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+        self.uncommitted = 0
+
+    @staticmethod
+    def get_key(*parts):
+        digest = hashlib.sha1()
+        for part in parts:
+            digest.update('{!r}\0'.format(part).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        row = self.connection.execute('SELECT result, duration FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute('UPDATE results SET accessed = ? WHERE key = ?', (time.time(), key))
+        self.mark_changed()
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key, result, duration):
+        try:
+            data = pickle.dumps(result)
+        except Exception:
+            return
+        self.connection.execute(
+            'INSERT OR REPLACE INTO results (key, result, duration, size, accessed) VALUES (?, ?, ?, ?, ?)',
+            (key, data, duration, len(data), time.time()),
+        )
+        self.mark_changed()
+
+    def mark_changed(self):
+        self.uncommitted += 1
+        if self.uncommitted >= self.COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def get_size(self):
+        return self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def evict(self):
+        excess = self.get_size() - self.max_size
+        if excess <= 0:
+            return
+        to_remove = []
+        for key, size in self.connection.execute('SELECT key, size FROM results ORDER BY accessed'):
+            if excess <= 0:
+                break
+            to_remove.append((key,))
+            excess -= size
+        self.connection.executemany('DELETE FROM results WHERE key = ?', to_remove)
+        self.commit()
+
+    def close(self):
+        self.commit()
+        self.evict()
+        self.connection.close()
@@ -102,6 +102,7 @@ class AbstractSourceGenerator(ast.NodeVisitor):
 
     def __init__(self, indent_with):
         self.result = []
+        self.result_new_lines = 0
         self.indent_with = indent_with
         self.indentation = 0
         self.new_line = False
@@ -112,21 +113,25 @@ class AbstractSourceGenerator(ast.NodeVisitor):
 
     def write(self, x, node=None):
         self.correct_line_number(node)
+        self.append(x)
+
+    def append(self, x):
         self.result.append(x)
+        self.result_new_lines += x.count('\n')
 
     def correct_line_number(self, node):
         if self.new_line:
             if self.result:
-                self.result.append('\n')
-            self.result.append(self.indent_with * self.indentation)
+                self.append('\n')
+            self.append(self.indent_with * self.indentation)
             self.new_line = False
 
         if node and hasattr(node, 'lineno'):
-            lines = len("".join(self.result).split('\n')) if self.result else 0
+            lines = self.result_new_lines + 1 if self.result else 0
             line_diff = node.lineno - lines
 
             if line_diff:
-                self.result.append(('\n' + (self.indent_with * self.indentation)) * line_diff)
+                self.append(('\n' + (self.indent_with * self.indentation)) * line_diff)
 
     def newline(self, node=None):
         self.new_line = True
@@ -1,6 +1,10 @@
 import argparse
+import copy
+import multiprocessing
+import os
+import subprocess
 import sys
-from mutpy import controller, views, operators, utils
+from mutpy import controller, views, operators, utils, cache, coverage, journal, distributed
 from mutpy import __version__ as version
 
 
@@ -9,8 +13,20 @@ def main(argv):
     run_mutpy(parser)
 
 
+COORDINATOR_OPTIONS = [
+    'report', 'report_jsonl', 'report_db', 'report_html', 'journal', 'resume', 'cache', 'coordinator', 'debug',
+    'show_mutants', 'authkey',
+]
+
+WORKER_OPTIONS = ['jobs', 'max_worker_mutants']
+
+AUTHKEY_ENV = 'MUTPY_AUTHKEY'
+
+
 def build_parser():
     DEF_TIMEOUT_FACTOR = 5
+    DEF_MAX_WORKER_MUTANTS = 100
+    DEF_CACHE_SIZE = 100
     parser = argparse.ArgumentParser(description='Mutation testing tool for Python 3.x source code. ',
                                      fromfile_prefix_chars='@')
     parser.add_argument('--version', '-v', action='version', version='%(prog)s {}'.format(version))
@@ -18,6 +34,10 @@ def build_parser():
     parser.add_argument('--unit-test', '-u', type=str, nargs='+',
                         help='test class, test method, module or package with unit tests')
     parser.add_argument('--report', '-r', type=str, help='generate YAML report', metavar='REPORT_FILE')
+    parser.add_argument('--report-jsonl', type=str, metavar='REPORT_FILE',
+                        help='generate JSON Lines report written while mutants finish')
+    parser.add_argument('--report-db', type=str, metavar='DB_FILE',
+                        help='store results in SQLite database (appended as new run)')
     parser.add_argument('--report-html', type=str, help='generate HTML report', metavar='DIR_NAME')
     parser.add_argument('--timeout-factor', '-f', type=float, default=DEF_TIMEOUT_FACTOR,
                         help='max timeout factor (default {})'.format(DEF_TIMEOUT_FACTOR))
@@ -37,23 +57,77 @@ def build_parser():
     parser.add_argument('--path', '-p', type=str, metavar='DIR', help='extend Python path')
     parser.add_argument('--percentage', type=int, metavar='PERCENTAGE', default=100,
                         help='percentage of the generated mutants (mutation sampling)')
+    parser.add_argument('--time-budget', type=parse_time, metavar='TIME',
+                        help='sample mutants to finish mutation in given time, e.g. 900, 90s, 15m or 2h')
+    parser.add_argument('--sampling-seed', type=int, metavar='SEED', default=0,
+                        help='seed of mutation sampling (default 0)')
+    parser.add_argument('--sampling-strata', type=str, nargs='+', metavar='STRATUM', default=[],
+                        choices=utils.MutationSampler.STRATA,
+                        help='apply sampling percentage separately to mutants of each operator, module or function')
     parser.add_argument('--coverage', action='store_true',
                         help='mutate only covered code')
+    parser.add_argument('--coverage-backend', type=str, choices=sorted(coverage.coverage_backends), default='inject',
+                        help='collect coverage by tracing executed lines or by injecting coverage statements '
+                        '(default inject)')
     parser.add_argument('--order', type=int, metavar='ORDER', default=1, help='mutation order')
     parser.add_argument('--hom-strategy', type=str, metavar='HOM_STRATEGY', help='HOM strategy',
                         default='FIRST_TO_LAST')
     parser.add_argument('--list-hom-strategies', action='store_true', help='list available HOM strategies')
     parser.add_argument('--mutation-number', type=int, metavar='MUTATION_NUMBER',
                         help='run only one mutation (debug purpose)')
+    parser.add_argument('--diff', type=str, metavar='REVISION',
+                        help='mutate only lines changed since git revision')
+    parser.add_argument('--cache', type=str, metavar='CACHE_FILE',
+                        help='reuse results of unchanged mutants and tests stored in cache file')
+    parser.add_argument('--cache-size', type=int, metavar='CACHE_SIZE', default=DEF_CACHE_SIZE,
+                        help='max cache file size in MB (default {})'.format(DEF_CACHE_SIZE))
+    parser.add_argument('--journal', type=str, metavar='JOURNAL_FILE',
+                        help='append result of each mutant to journal file')
+    parser.add_argument('--resume', type=str, metavar='JOURNAL_FILE',
+                        help='skip mutants recorded in journal file and append new results to it')
+    parser.add_argument('--skip-equivalent', action='store_true',
+                        help='skip mutants compiled to the same bytecode as original or other mutant '
+                        '(trivial compiler equivalence)')
+    parser.add_argument('--prioritize-tests', action='store_true',
+                        help='run tests which killed mutants of the same node or operator first, then fastest tests')
+    parser.add_argument('--schemata', action='store_true',
+                        help='compile all mutants of module into one schema module (mutant schemata)')
+    parser.add_argument('--jobs', '-j', type=int, metavar='JOBS', default=1,
+                        help='number of mutants executed in parallel (default 1)')
+    parser.add_argument('--max-worker-mutants', type=int, metavar='MAX_WORKER_MUTANTS', default=DEF_MAX_WORKER_MUTANTS,
+                        help='number of mutants executed by worker process before it is restarted '
+                        '(default {})'.format(DEF_MAX_WORKER_MUTANTS))
+    parser.add_argument('--coordinator', type=str, metavar='HOST:PORT',
+                        help='serve mutants to remote workers instead of running them locally')
+    parser.add_argument('--worker', type=str, metavar='HOST:PORT',
+                        help='run mutants served by coordinator')
+    parser.add_argument('--authkey', type=str, metavar='KEY', default=os.environ.get(AUTHKEY_ENV),
+                        help='key shared by coordinator and workers (default ${})'.format(AUTHKEY_ENV))
     return parser
 
 
+def parse_time(value):
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    try:
+        if value and value[-1] in units:
+            seconds = float(value[:-1]) * units[value[-1]]
+        else:
+            seconds = float(value)
+    except ValueError:
+        seconds = 0
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError('invalid time: {!r}'.format(value))
+    return seconds
+
+
 def run_mutpy(parser):
     cfg = parser.parse_args()
     if cfg.list_operators:
         list_operators()
     elif cfg.list_hom_strategies:
         list_hom_strategies()
+    elif cfg.worker:
+        run_worker(cfg)
     elif cfg.target and cfg.unit_test:
         mutation_controller = build_controller(cfg)
         mutation_controller.run()
@@ -62,7 +136,8 @@ def run_mutpy(parser):
 
 
 def build_controller(cfg):
-    built_views = build_views(cfg)
+    resumed_journal = journal.MutationJournal(cfg.resume) if cfg.resume else None
+    built_views = build_views(cfg, resumed_journal)
     mutant_generator = build_mutator(cfg)
     target_loader = utils.ModulesLoader(cfg.target, cfg.path)
     test_loader = utils.ModulesLoader(cfg.unit_test, cfg.path)
@@ -74,10 +149,71 @@ def build_controller(cfg):
         timeout_factor=cfg.timeout_factor,
         disable_stdout=cfg.disable_stdout,
         mutate_covered=cfg.coverage,
+        coverage_backend=cfg.coverage_backend,
+        prioritize_tests=cfg.prioritize_tests,
         mutation_number=cfg.mutation_number,
+        jobs=cfg.jobs,
+        max_worker_mutants=cfg.max_worker_mutants,
+        use_schemata=cfg.schemata,
+        skip_equivalent=cfg.skip_equivalent,
+        results_cache=build_results_cache(cfg),
+        changed_lines=build_changed_lines(cfg),
+        journal=resumed_journal,
+        coordinator=build_coordinator(cfg),
+        time_budget=cfg.time_budget,
     )
 
 
+def build_coordinator(cfg):
+    if not cfg.coordinator:
+        return None
+    worker_cfg = copy.copy(cfg)
+    for option in COORDINATOR_OPTIONS:
+        setattr(worker_cfg, option, None)
+    worker_cfg.quiet = True
+    try:
+        return distributed.Coordinator(distributed.parse_address(cfg.coordinator), worker_cfg, get_authkey(cfg))
+    except (OSError, ValueError) as error:
+        print('Can\'t listen on {}! ({})'.format(cfg.coordinator, error))
+        sys.exit(-1)
+
+
+def run_worker(cfg):
+    try:
+        worker = distributed.Worker(distributed.parse_address(cfg.worker), get_authkey(cfg))
+    except (OSError, ValueError, EOFError, multiprocessing.AuthenticationError) as error:
+        print('Can\'t connect to coordinator {}! ({})'.format(cfg.worker, error))
+        sys.exit(-1)
+    worker_cfg = copy.copy(worker.config)
+    for option in WORKER_OPTIONS:
+        setattr(worker_cfg, option, getattr(cfg, option))
+    mutation_controller = build_controller(worker_cfg)
+    mutation_controller.run_worker(worker)
+
+
+def get_authkey(cfg):
+    if not cfg.authkey:
+        print('Authentication key is required! (use --authkey or ${})'.format(AUTHKEY_ENV))
+        sys.exit(-1)
+    return cfg.authkey.encode()
+
+
+def build_changed_lines(cfg):
+    if not cfg.diff:
+        return None
+    try:
+        return utils.get_changed_lines(cfg.diff)
+    except (OSError, subprocess.CalledProcessError) as error:
+        print('Can\'t get changes since revision {}! ({})'.format(cfg.diff, error))
+        sys.exit(-1)
+
+
+def build_results_cache(cfg):
+    if cfg.cache:
+        return cache.ResultsCache(cfg.cache, max_size=cfg.cache_size * 1024 * 1024)
+    return None
+
+
 def build_mutator(cfg):
     operators_set = set()
 
@@ -96,10 +232,17 @@ def build_mutator(cfg):
                       for name in cfg.disable_operator}
 
     if cfg.order == 1:
-        return controller.FirstOrderMutator(operators_set, cfg.percentage)
+        return controller.FirstOrderMutator(operators_set, cfg.percentage, cfg.sampling_seed, cfg.sampling_strata)
     else:
+        if cfg.time_budget:
+            print('Time budget is supported only with first order mutation.')
+            sys.exit(-1)
+        if cfg.sampling_strata:
+            print('Sampling strata are supported only with first order mutation.')
+            sys.exit(-1)
         hom_strategy = build_hom_strategy(cfg)
-        return controller.HighOrderMutator(operators_set, cfg.percentage, hom_strategy=hom_strategy)
+        return controller.HighOrderMutator(operators_set, cfg.percentage, cfg.sampling_seed, cfg.sampling_strata,
+                                           hom_strategy=hom_strategy)
 
 
 def build_hom_strategy(cfg):
@@ -130,7 +273,7 @@ def build_name_to_operator_map():
     return result
 
 
-def build_views(cfg):
+def build_views(cfg, resumed_journal=None):
     views_list = []
 
     if cfg.quiet:
@@ -141,9 +284,20 @@ def build_views(cfg):
     if cfg.report:
         views_list.append(views.YAMLReportView(cfg.report))
 
+    if cfg.report_jsonl:
+        views_list.append(views.JSONLReportView(cfg.report_jsonl))
+
+    if cfg.report_db:
+        views_list.append(views.SQLiteReportView(cfg.report_db))
+
     if cfg.report_html:
         views_list.append(views.HTMLReportView(cfg.report_html))
 
+    if cfg.journal:
+        views_list.append(views.JournalView(journal.MutationJournal(cfg.journal)))
+    elif resumed_journal:
+        views_list.append(views.JournalView(resumed_journal))
+
     if cfg.debug:
         views_list.append(views.DebugView())
 
@@ -1,7 +1,14 @@
+import functools
+import hashlib
+import importlib
+import marshal
+import math
+import os
 import random
 import sys
 import unittest
-from mutpy import views, utils, coverage
+from collections import OrderedDict, defaultdict
+from mutpy import views, utils, coverage, operators, schemata, codegen, distributed
 
 
 class TestsFailAtOriginal(Exception):
@@ -11,19 +18,56 @@ class TestsFailAtOriginal(Exception):
 
 
 class MutationScore:
+    CONFIDENCE_Z = 1.96
 
     def __init__(self):
         self.killed_mutants = 0
         self.timeout_mutants = 0
         self.incompetent_mutants = 0
         self.survived_mutants = 0
+        self.equivalent_mutants = 0
         self.covered_nodes = 0
         self.all_nodes = 0
+        self.samples = {}
+        self.population = {}
 
     def count(self):
         bottom = self.all_mutants - self.incompetent_mutants
         return (((self.killed_mutants + self.timeout_mutants) / bottom) * 100) if bottom else 0
 
+    def add_sample(self, stratum, detected, competent=True):
+        sample = self.samples.setdefault(stratum, [0, 0, 0])
+        if competent:
+            sample[0] += int(detected)
+            sample[1] += 1
+        sample[2] += 1
+
+    def get_competent_population(self, stratum, population):
+        _, competent, sampled = self.samples.get(stratum, (0, 0, 0))
+        return population * competent / sampled if sampled else population
+
+    def get_confidence_interval(self, z=CONFIDENCE_Z):
+        populations = {
+            stratum: self.get_competent_population(stratum, population)
+            for stratum, population in self.population.items()
+        }
+        total = sum(populations.values())
+        if not total:
+            return None
+        estimate = variance = unknown_weight = 0
+        for stratum, population in populations.items():
+            weight = population / total
+            detected, competent, _ = self.samples.get(stratum, (0, 0, 0))
+            if not competent:
+                unknown_weight += weight
+                continue
+            estimate += weight * detected / competent
+            smoothed_proportion = (detected + 1) / (competent + 2)
+            correction = max(0, 1 - competent / population) if population else 0
+            variance += weight ** 2 * smoothed_proportion * (1 - smoothed_proportion) / competent * correction
+        margin = z * math.sqrt(variance)
+        return 100 * max(0, estimate - margin), 100 * min(1, estimate + margin + unknown_weight)
+
     def inc_killed(self):
         self.killed_mutants += 1
 
@@ -36,6 +80,9 @@ class MutationScore:
     def inc_survived(self):
         self.survived_mutants += 1
 
+    def inc_equivalent(self):
+        self.equivalent_mutants += 1
+
     def update_coverage(self, covered_nodes, all_nodes):
         self.covered_nodes += covered_nodes
         self.all_nodes += all_nodes
@@ -45,10 +92,128 @@ class MutationScore:
         return self.killed_mutants + self.timeout_mutants + self.incompetent_mutants + self.survived_mutants
 
 
+class PendingMutant:
+
+    def __init__(self, number, mutations, module, mutant):
+        self.number = number
+        self.mutations = mutations
+        self.module = module
+        self.mutant = mutant
+        self.finished = False
+        self.cancelled = False
+        self.equivalent = False
+        self.duplicate_of = None
+        self.cache_key = None
+        self.result = None
+        self.duration = 0
+
+    def finish(self, result, duration):
+        self.finished = True
+        self.result = result
+        self.duration = duration
+
+
+class MutantsStream:
+
+    def __init__(self, module_name, mutants, coverage_result):
+        self.module_name = module_name
+        self.mutants = iter(mutants)
+        self.coverage_result = coverage_result
+        self.next_index = 0
+
+    def take(self, start, stop):
+        for mutations, mutant_ast in self.mutants:
+            index = self.next_index
+            self.next_index += 1
+            if index >= start:
+                yield index, mutations, mutant_ast
+            if self.next_index >= stop:
+                return
+
+
+class TestsPrioritizer:
+    """Orders tests so that likely killers of a mutant are run first.
+
+    Tests which killed previous mutants of the same node or with the same
+    operator go first, then the rest of tests from the fastest one. Tests of
+    the same module and class are kept together, so their fixtures are set up
+    only once.
+    """
+    MAX_KILLERS = 10
+
+    def __init__(self, durations, test_ids):
+        self.durations = durations
+        self.test_ids = test_ids
+        self.node_killers = {}
+        self.operator_killers = {}
+
+    def add_killer(self, module_name, mutations, killer):
+        test_id = self.test_ids.get(killer)
+        if test_id is None:
+            return
+        for mutation in mutations:
+            node_key = self.get_node_key(module_name, mutation)
+            if node_key:
+                self.add_to_history(self.node_killers, node_key, test_id)
+            self.add_to_history(self.operator_killers, mutation.operator, test_id)
+
+    def add_to_history(self, history, key, test_id):
+        killers = history.setdefault(key, [])
+        if test_id in killers:
+            killers.remove(test_id)
+        killers.insert(0, test_id)
+        del killers[self.MAX_KILLERS:]
+
+    def get_node_key(self, module_name, mutation):
+        node_index = getattr(mutation.node, 'index', None)
+        return (module_name, node_index) if node_index is not None else None
+
+    def get_prioritized_tests(self, module_name, mutations):
+        killers = []
+        for mutation in mutations:
+            killers += self.node_killers.get(self.get_node_key(module_name, mutation), [])
+        for mutation in mutations:
+            killers += self.operator_killers.get(mutation.operator, [])
+        return list(OrderedDict.fromkeys(killers))
+
+    def sort(self, suite, prioritized_tests):
+        priorities = {test_id: index for index, test_id in enumerate(prioritized_tests)}
+
+        def get_priority(test):
+            return priorities.get(test.id(), len(priorities)), self.durations.get(test.id(), 0)
+
+        modules = OrderedDict()
+        for test in self.get_tests(suite):
+            classes = modules.setdefault(test.__class__.__module__, OrderedDict())
+            classes.setdefault(test.__class__, []).append(test)
+        tests = []
+        for classes in sorted(modules.values(), key=lambda classes: min(
+                get_priority(test) for class_tests in classes.values() for test in class_tests)):
+            for class_tests in sorted(classes.values(), key=lambda class_tests: min(map(get_priority, class_tests))):
+                tests += sorted(class_tests, key=get_priority)
+        return unittest.TestSuite(tests)
+
+    def get_tests(self, suite):
+        if isinstance(suite, unittest.TestSuite):
+            for test in suite:
+                yield from self.get_tests(test)
+        else:
+            yield suite
+
+
 class MutationController(views.ViewNotifier):
+    MIN_TESTS_DURATION = 1
+    MUTANT_OVERHEAD = 0.01
+    TIME_BUDGET_MIN_PERCENTAGE = 1e-6
+    TIME_BUDGET_SEARCH_STEPS = 50
+    MAX_PENDING_FACTOR = 4
+    TIME_BUDGET_STRATA = ['operator', 'module']
 
     def __init__(self, target_loader, test_loader, views, mutant_generator,
-                 timeout_factor=5, disable_stdout=False, mutate_covered=False, mutation_number=None):
+                 timeout_factor=5, disable_stdout=False, mutate_covered=False, mutation_number=None, jobs=1,
+                 max_worker_mutants=None, use_schemata=False, skip_equivalent=False, results_cache=None,
+                 changed_lines=None, coverage_backend='inject', prioritize_tests=False, journal=None,
+                 coordinator=None, time_budget=None):
         super().__init__(views)
         self.target_loader = target_loader
         self.test_loader = test_loader
@@ -56,7 +221,41 @@ class MutationController(views.ViewNotifier):
         self.timeout_factor = timeout_factor
         self.stdout_manager = utils.StdoutManager(disable_stdout)
         self.mutate_covered = mutate_covered
+        self.coverage_backend = coverage_backend
         self.mutation_number = mutation_number
+        self.jobs = jobs
+        self.use_schemata = use_schemata
+        self.skip_equivalent = skip_equivalent
+        self.results_cache = results_cache
+        self.journal = journal
+        self.coordinator = coordinator
+        self.sampling_seed = coordinator.seed if coordinator else None
+        self.mutants_stream = None
+        self.modules_graph = None
+        self.modules_to_reload = {}
+        self.kept_modules = {}
+        self.replaced_modules = {}
+        self.references_patcher = None
+        self.time_budget = time_budget
+        self.deadline = None
+        self.time_budget_exceeded = False
+        if coordinator:
+            coordinator.sampler = mutant_generator.sampler
+        self.changed_lines = changed_lines
+        self.prioritize_tests = prioritize_tests
+        self.tests_prioritizer = None
+        self.test_durations = {}
+        self.tests_load_duration = 0
+        self.test_modules_names = set()
+        self.prepared_targets = {}
+        self.tests_digest = None
+        self.schema_module = None
+        self.schema_code = None
+        self.schema_state = None
+        self.pending_mutants = OrderedDict()
+        self.worker_pool = None
+        if utils.get_mutation_test_runner_class() is utils.MutationTestRunnerProcess:
+            self.worker_pool = utils.MutationTestWorkerPool(jobs, self.run_mutant_task, max_worker_mutants)
         self.store_init_modules()
 
     def run(self):
@@ -72,38 +271,195 @@ class MutationController(views.ViewNotifier):
             self.notify_cant_load(error.name, error.exception)
             sys.exit(-2)
 
+    def run_worker(self, worker):
+        self.sampling_seed = worker.seed
+        if worker.sampler:
+            self.mutant_generator.sampler = worker.sampler
+        try:
+            test_modules, total_duration, _ = self.load_and_check_tests()
+            targets = {}
+            for target_module, to_mutate in self.target_loader.load([module for module, *_ in test_modules]):
+                targets[target_module.__name__] = (target_module, to_mutate)
+            worker.serve(functools.partial(self.run_work_unit, targets, total_duration))
+        except KeyboardInterrupt:
+            pass
+        except TestsFailAtOriginal as error:
+            self.notify_original_tests_fail(error.result)
+            sys.exit(-1)
+        except utils.ModulesLoaderException as error:
+            self.notify_cant_load(error.name, error.exception)
+            sys.exit(-2)
+        finally:
+            if self.worker_pool:
+                self.worker_pool.close()
+
+    def run_work_unit(self, targets, total_duration, unit):
+        module_name, start, stop = unit
+        target_module, to_mutate = targets[module_name]
+        stream = self.mutants_stream
+        if not stream or stream.module_name != module_name or stream.next_index > start:
+            stream = self.mutants_stream = self.create_mutants_stream(target_module, to_mutate)
+        pending_mutants = OrderedDict()
+        for index, mutations, mutant_ast in stream.take(start, stop):
+            pending_mutant = pending_mutants[index] = PendingMutant(index, mutations, module_name, mutant_ast)
+            if self.worker_pool:
+                self.start_mutant_task(pending_mutant, target_module, mutant_ast, total_duration,
+                                       stream.coverage_result)
+                while self.worker_pool.is_full():
+                    self.collect_unit_results(pending_mutants)
+            else:
+                self.run_mutant(pending_mutant, target_module, mutant_ast, total_duration, stream.coverage_result)
+        while not all(pending_mutant.finished for pending_mutant in pending_mutants.values()):
+            self.collect_unit_results(pending_mutants)
+        return [(index, pending_mutant.result, pending_mutant.duration)
+                for index, pending_mutant in pending_mutants.items()]
+
+    def collect_unit_results(self, pending_mutants):
+        for index, result, duration in self.worker_pool.wait_for_results():
+            self.finish_mutant(pending_mutants[index], result, duration)
+
+    def create_mutants_stream(self, target_module, to_mutate):
+        lines = self.get_changed_lines(target_module)
+        target_ast = self.create_target_ast(target_module)
+        coverage_injector, coverage_result = self.inject_coverage(target_ast, target_module)
+        self.seed_sampling(target_module)
+        mutants = self.mutant_generator.mutate(target_ast, to_mutate, coverage_injector, module=target_module,
+                                               lines=lines)
+        return MutantsStream(target_module.__name__, mutants, coverage_result)
+
+    def seed_sampling(self, target_module):
+        if self.sampling_seed is not None:
+            random.seed('{}:{}'.format(self.sampling_seed, target_module.__name__))
+
     def run_mutation_process(self):
         try:
+            if self.time_budget:
+                self.deadline = utils.Timer.time_provider() + self.time_budget
             test_modules, total_duration, number_of_tests = self.load_and_check_tests()
 
             self.notify_passed(test_modules, number_of_tests)
             self.notify_start()
 
+            if self.results_cache:
+                self.tests_digest = self.get_tests_digest(test_modules)
+            if self.coordinator:
+                self.coordinator.set_mutant_live_time(self.get_live_time(total_duration))
+
             self.score = MutationScore()
 
+            if self.time_budget and not self.mutation_number:
+                self.apply_time_budget(test_modules, total_duration)
             for target_module, to_mutate in self.target_loader.load([module for module, *_ in test_modules]):
+                if self.is_time_budget_exceeded():
+                    break
                 self.mutate_module(target_module, to_mutate, total_duration)
+            self.collect_pending_mutants()
+            if not self.time_budget_exceeded:
+                self.score.population = self.mutant_generator.sampler.get_population()
         except KeyboardInterrupt:
             pass
+        finally:
+            if self.worker_pool:
+                self.worker_pool.close()
+            if self.coordinator:
+                self.coordinator.close()
+            if self.results_cache:
+                self.results_cache.close()
+
+    def apply_time_budget(self, test_modules, total_duration):
+        sampler = self.mutant_generator.sampler
+        strata = sampler.strata
+        sampler.strata = strata or self.TIME_BUDGET_STRATA
+        strata_sizes = defaultdict(int)
+        for target_module, to_mutate in self.target_loader.load([module for module, *_ in test_modules]):
+            lines = self.get_changed_lines(target_module)
+            if lines is not None and not lines:
+                continue
+            target_ast = self.create_target_ast(target_module)
+            coverage_injector, coverage_result = self.inject_coverage(target_ast, target_module)
+            traversal = self.mutant_generator.collect_sites(target_ast, to_mutate, coverage_injector,
+                                                            module=target_module, lines=lines)
+            self.prepared_targets[target_module.__name__, to_mutate] = (target_ast, coverage_injector, coverage_result,
+                                                                       traversal)
+            for key, size in self.mutant_generator.count_candidates(traversal).items():
+                strata_sizes[key] += size
+        mutant_cost = (total_duration + self.tests_load_duration + self.MUTANT_OVERHEAD) / max(1, self.jobs)
+        max_mutants = max(0, self.deadline - utils.Timer.time_provider()) / mutant_cost
+        percentage = self.get_time_budget_percentage(list(strata_sizes.values()), max_mutants)
+        if percentage < sampler.percentage:
+            sampler.percentage = percentage
+        else:
+            sampler.strata = strata
+
+    def get_time_budget_percentage(self, strata_sizes, max_mutants):
+        sampler = self.mutant_generator.sampler
+        if sum(strata_sizes) <= max_mutants:
+            return 100
+        low, high = self.TIME_BUDGET_MIN_PERCENTAGE, 100
+        for _ in range(self.TIME_BUDGET_SEARCH_STEPS):
+            middle = (low + high) / 2
+            if sum(sampler.get_quota(size, middle) for size in strata_sizes) <= max_mutants:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def is_time_budget_exceeded(self):
+        if self.deadline is not None and utils.Timer.time_provider() >= self.deadline:
+            self.time_budget_exceeded = True
+        return self.time_budget_exceeded
+
+    def limit_to_deadline(self, live_time):
+        if self.deadline is None:
+            return live_time
+        return min(live_time, max(0, self.deadline - utils.Timer.time_provider()))
 
     def load_and_check_tests(self):
         test_modules = []
         number_of_tests = 0
         total_duration = 0
-        for test_module, target_test in self.test_loader.load():
-            result, duration = self.run_test(test_module, target_test)
-            if result.wasSuccessful():
-                test_modules.append((test_module, target_test, duration))
-            else:
-                raise TestsFailAtOriginal(result)
-            number_of_tests += result.testsRun
-            total_duration += duration
+        test_ids = {}
+        with utils.ModulesDependencyGraph() as self.modules_graph:
+            timer = utils.Timer()
+            loaded_tests = list(self.test_loader.load())
+            self.tests_load_duration = timer.stop()
+            self.test_modules_names = {test_module.__name__ for test_module, _ in loaded_tests}
+            for test_module, target_test in loaded_tests:
+                result, duration = self.run_test(test_module, target_test)
+                if result.wasSuccessful():
+                    test_modules.append((test_module, target_test, duration))
+                else:
+                    raise TestsFailAtOriginal(result)
+                number_of_tests += result.testsRun
+                total_duration += duration
+                self.test_durations.update(result.durations)
+                test_ids.update(result.test_ids)
+        if self.prioritize_tests:
+            self.tests_prioritizer = TestsPrioritizer(self.test_durations, test_ids)
 
         return test_modules, total_duration, number_of_tests
 
+    def get_tests_digest(self, test_modules):
+        sources = []
+        for test_module, target_test, _ in test_modules:
+            with open(test_module.__file__) as test_file:
+                sources.append((test_module.__name__, target_test, test_file.read()))
+        return self.results_cache.get_key(*sources, *self.get_dependencies_digests())
+
+    def get_dependencies_digests(self):
+        if self.modules_graph is None:
+            return []
+        digests = []
+        for name in sorted(self.modules_graph.modules - self.modules_graph.initial_modules):
+            module_file = getattr(sys.modules.get(name), '__file__', None)
+            if module_file and os.path.isfile(module_file):
+                with open(module_file, 'rb') as source_file:
+                    digests.append((name, hashlib.sha1(source_file.read()).hexdigest()))
+        return digests
+
     def run_test(self, test_module, target_test):
         suite = self.get_test_suite(test_module, target_test)
-        result = unittest.TestResult()
+        result = utils.TimedTestResult()
         timer = utils.Timer()
         with self.stdout_manager:
             suite.run(result)
@@ -117,33 +473,165 @@ class MutationController(views.ViewNotifier):
 
     @utils.TimeRegister
     def mutate_module(self, target_module, to_mutate, total_duration):
-        target_ast = self.create_target_ast(target_module)
-        coverage_injector, coverage_result = self.inject_coverage(target_ast, target_module)
+        lines = self.get_changed_lines(target_module)
+        if lines is not None and not lines:
+            return
+        prepared_target = self.prepared_targets.pop((target_module.__name__, to_mutate), None)
+        if prepared_target:
+            target_ast, coverage_injector, coverage_result, traversal = prepared_target
+        else:
+            target_ast = self.create_target_ast(target_module)
+            coverage_injector, coverage_result = self.inject_coverage(target_ast, target_module)
+            traversal = None
+        self.notify_original(target_module.__name__, target_ast)
 
         if coverage_injector:
             self.score.update_coverage(*coverage_injector.get_result())
-        for mutations, mutant_ast in self.mutant_generator.mutate(target_ast, to_mutate, coverage_injector,
-                                                                  module=target_module):
-            mutation_number = self.score.all_mutants + 1
+        schema = self.create_schema(target_ast, to_mutate, coverage_injector, target_module, lines)
+        original_digest = self.get_code_digest(target_ast, target_module) if self.skip_equivalent else None
+        compute_digest = self.skip_equivalent or self.results_cache
+        mutant_digests = {}
+        self.seed_sampling(target_module)
+        mutants = self.mutant_generator.mutate(target_ast, to_mutate, coverage_injector, module=target_module,
+                                               lines=lines, traversal=traversal)
+        for mutant_index, (mutations, mutant_ast) in enumerate(mutants):
+            if self.is_time_budget_exceeded():
+                break
+            mutation_number = self.get_mutation_number()
             if self.mutation_number and self.mutation_number != mutation_number:
                 self.score.inc_incompetent()
                 continue
-            self.notify_mutation(mutation_number, mutations, target_module.__name__, mutant_ast)
-            mutant_module = self.create_mutant_module(target_module, mutant_ast)
-            if mutant_module:
-                self.run_tests_with_mutant(total_duration, mutant_module, mutations, coverage_result)
+            pending_mutant = PendingMutant(mutation_number, mutations, target_module.__name__, mutant_ast)
+            self.pending_mutants[mutation_number] = pending_mutant
+            mutant_digest = self.get_code_digest(mutant_ast, target_module) if compute_digest else None
+            if mutant_digest and mutant_digest == original_digest:
+                pending_mutant.equivalent = True
+                pending_mutant.finish(None, 0)
+            elif self.skip_equivalent and mutant_digest in mutant_digests:
+                pending_mutant.duplicate_of = mutant_digests[mutant_digest]
+            elif self.journal and self.finish_from_journal(pending_mutant):
+                pass
+            elif self.results_cache and self.finish_from_cache(pending_mutant, mutant_digest):
+                pass
             else:
-                self.score.inc_incompetent()
+                if mutant_digest:
+                    mutant_digests[mutant_digest] = pending_mutant
+                if self.coordinator:
+                    self.submit_work(pending_mutant, target_module, mutant_index)
+                elif self.worker_pool:
+                    self.submit_mutant(pending_mutant, target_module, mutant_ast, total_duration, coverage_result,
+                                       schema)
+                else:
+                    self.run_mutant(pending_mutant, target_module, mutant_ast, total_duration, coverage_result)
+            self.notify_finished_mutants()
+            if mutation_number in self.pending_mutants:
+                pending_mutant.mutant = codegen.to_source(mutant_ast)
+            while self.is_pending_full():
+                self.collect_finished_mutants()
+
+    def is_pending_full(self):
+        if self.coordinator:
+            capacity = self.coordinator.get_capacity()
+        else:
+            capacity = self.jobs
+        return len(self.pending_mutants) > self.MAX_PENDING_FACTOR * max(1, capacity)
+
+    def finish_from_cache(self, pending_mutant, mutant_digest):
+        if not mutant_digest:
+            return False
+        pending_mutant.cache_key = self.get_cache_key(pending_mutant, mutant_digest)
+        cached = self.results_cache.get(pending_mutant.cache_key)
+        if cached is None:
+            return False
+        pending_mutant.cache_key = None
+        pending_mutant.finish(*cached)
+        return True
+
+    def get_cache_key(self, pending_mutant, mutant_digest):
+        return self.results_cache.get_key(
+            self.tests_digest,
+            pending_mutant.module,
+            mutant_digest,
+            [(mutation.operator.name(), mutation.visitor) for mutation in pending_mutant.mutations],
+            self.timeout_factor,
+            self.mutate_covered and self.coverage_backend,
+        )
+
+    def finish_from_journal(self, pending_mutant):
+        entry = self.journal.get(pending_mutant.module, pending_mutant.mutations)
+        if entry is None:
+            return False
+        status = entry['status']
+        if status == 'equivalent':
+            pending_mutant.equivalent = True
+            result = None
+        elif status == 'timeout':
+            result = None
+        else:
+            exception = Exception(entry.get('exception', '').strip()) if status == 'incompetent' else None
+            result = utils.SerializableMutationTestResult(
+                is_incompetent=status == 'incompetent',
+                is_survived=status == 'survived',
+                killer=entry['killer'],
+                exception_traceback=entry['exception_traceback'],
+                exception=exception,
+                tests_run=entry['tests_run'],
+            )
+        pending_mutant.finish(result, entry['time'] or 0)
+        return True
+
+    def get_changed_lines(self, target_module):
+        if self.changed_lines is None:
+            return None
+        return self.changed_lines.get(os.path.realpath(target_module.__file__), set())
+
+    def get_mutation_number(self):
+        return self.score.all_mutants + self.score.equivalent_mutants + len(self.pending_mutants) + 1
+
+    @utils.TimeRegister
+    def get_code_digest(self, node, target_module):
+        try:
+            return utils.get_code_digest(compile(node, target_module.__name__, 'exec'))
+        except BaseException:
+            return None
+
+    @utils.TimeRegister
+    def create_schema(self, target_ast, to_mutate, coverage_injector, target_module, lines=None):
+        if not (self.use_schemata and self.worker_pool) or self.coordinator:
+            return None
+        schema = schemata.MutantSchema(target_ast)
+        for mutations, _ in self.mutant_generator.mutate(target_ast, to_mutate, coverage_injector,
+                                                         module=target_module, lines=lines):
+            schema.add_mutant(mutations)
+        try:
+            code = schema.compile(target_module.__name__)
+            schema.remove_mutants(self.get_import_time_mutants(code, target_module.__name__))
+        except Exception:
+            return None
+        schema.code = marshal.dumps(code)
+        return schema
+
+    def get_import_time_mutants(self, schema_code, module_name):
+        switch_recorder = schemata.SwitchRecorder()
+        with self.stdout_manager:
+            schema_module = schemata.create_schema_module(schema_code, module_name, switch_recorder)
+        self.create_test_suite(schema_module)
+        self.restore_loaded_modules()
+        schemata.activate_mutant(schema_module, 0)
+        return switch_recorder.mutant_ids
 
     def inject_coverage(self, target_ast, target_module):
         if not self.mutate_covered:
             return None, None
-        coverage_injector = coverage.CoverageInjector()
+        coverage_injector = coverage.coverage_backends[self.coverage_backend]()
         coverage_module = coverage_injector.inject(target_ast, target_module.__name__)
         suite = self.create_test_suite(coverage_module)
         coverage_result = coverage.CoverageTestResult(coverage_injector=coverage_injector)
-        with self.stdout_manager:
-            suite.run(coverage_result)
+        try:
+            with self.stdout_manager:
+                suite.run(coverage_result)
+        finally:
+            self.restore_loaded_modules()
         return coverage_injector, coverage_result
 
     @utils.TimeRegister
@@ -152,28 +640,95 @@ class MutationController(views.ViewNotifier):
             return utils.create_ast(target_file.read())
 
     @utils.TimeRegister
-    def create_mutant_module(self, target_module, mutant_ast):
+    def create_mutant_module(self, module_name, mutant_code):
+        with self.stdout_manager:
+            return utils.create_module_from_code(mutant_code, module_name)
+
+    def create_test_suite(self, mutant_module, covering_tests=None):
+        self.restore_loaded_modules()
+        if self.modules_graph is not None:
+            kept_modules = self.get_kept_modules(mutant_module.__name__)
+            self.replaced_modules = {name: sys.modules[name] for name in self.get_modules_to_reload(
+                mutant_module.__name__) - kept_modules if name in sys.modules}
+        else:
+            kept_modules = set()
+        utils.InjectImporter(mutant_module).install()
         try:
-            with self.stdout_manager:
-                return utils.create_module(
-                    ast_node=mutant_ast,
-                    module_name=target_module.__name__
-                )
-        except BaseException as exception:
-            self.notify_incompetent(0, exception, tests_run=0)
-            return None
-
-    def create_test_suite(self, mutant_module):
+            self.remove_loaded_modules(mutant_module.__name__, kept_modules)
+            if kept_modules:
+                self.patch_kept_modules(kept_modules)
+            return self.load_test_suite(covering_tests)
+        except BaseException:
+            self.restore_loaded_modules()
+            raise
+        finally:
+            utils.InjectImporter.uninstall()
+
+    def patch_kept_modules(self, kept_modules):
+        self.references_patcher = utils.ReferencesPatcher()
+        for name, old_module in sorted(self.replaced_modules.items()):
+            if name in sys.modules:
+                new_module = sys.modules[name]
+            elif name in self.test_modules_names:
+                [(new_module, _)] = self.test_loader.load_module(name)
+            else:
+                new_module = importlib.import_module(name)
+            self.references_patcher.add_module(old_module, new_module)
+        for name in kept_modules:
+            self.references_patcher.patch(sys.modules[name])
+
+    def restore_loaded_modules(self):
+        if self.references_patcher:
+            self.references_patcher.restore()
+            self.references_patcher = None
+        for name, module in self.replaced_modules.items():
+            sys.modules[name] = module
+            parent, _, child = name.rpartition('.')
+            if parent in sys.modules:
+                setattr(sys.modules[parent], child, module)
+        self.replaced_modules = {}
+
+    def load_test_suite(self, covering_tests=None):
+        if covering_tests is not None:
+            suite = self.load_covering_tests(covering_tests)
+            if suite is not None:
+                return suite
         suite = unittest.TestSuite()
-        utils.InjectImporter(mutant_module).install()
-        self.remove_loaded_modules()
         for test_module, target_test in self.test_loader.load():
             suite.addTests(self.get_test_suite(test_module, target_test))
-        utils.InjectImporter.uninstall()
+        if covering_tests is not None:
+            self.skip_not_covering_tests(suite, covering_tests)
         return suite
 
-    def mark_not_covered_tests_as_skip(self, mutations, coverage_result, suite):
+    def load_covering_tests(self, covering_tests):
+        test_loader = unittest.TestLoader()
+        suite = unittest.TestSuite()
+        modules = {}
+        for test_id in covering_tests:
+            module_name = self.get_test_module_name(test_id)
+            if module_name is None:
+                return None
+            if module_name not in modules:
+                [(modules[module_name], _)] = self.test_loader.load_module(module_name)
+            suite.addTests(test_loader.loadTestsFromName(test_id[len(module_name) + 1:], modules[module_name]))
+        if test_loader.errors:
+            return None
+        return suite
+
+    def get_test_module_name(self, test_id):
+        parts = test_id.split('.')
+        for index in range(len(parts) - 1, 0, -1):
+            module_name = '.'.join(parts[:index])
+            if module_name in self.test_modules_names:
+                return module_name
+        return None
+
+    def get_covering_tests(self, mutations, coverage_result):
         mutated_nodes = {mutation.node.marker for mutation in mutations}
+        return coverage_result.coverage_matrix.get_covering_test_names(mutated_nodes)
+
+    def skip_not_covering_tests(self, suite, covering_tests):
+        covering_tests = set(covering_tests)
 
         def iter_tests(tests):
             try:
@@ -183,24 +738,67 @@ class MutationController(views.ViewNotifier):
                 add_skip(tests)
 
         def add_skip(test):
-            if mutated_nodes.isdisjoint(coverage_result.test_covered_nodes[repr(test)]):
+            if test.id() not in covering_tests:
                 test_method = getattr(test, test._testMethodName)
                 setattr(test, test._testMethodName, unittest.skip('not covered')(test_method))
 
         iter_tests(suite)
 
+    def run_mutant(self, pending_mutant, target_module, mutant_ast, total_duration, coverage_result):
+        try:
+            mutant_code = compile(mutant_ast, target_module.__name__, 'exec')
+            mutant_module = self.create_mutant_module(target_module.__name__, mutant_code)
+        except BaseException as exception:
+            pending_mutant.finish(self.get_incompetent_result(exception), 0)
+            return
+        covering_tests = self.get_covering_tests(pending_mutant.mutations, coverage_result) if coverage_result else None
+        result, duration = self.run_tests_with_mutant(mutant_module, covering_tests,
+                                                      self.get_prioritized_tests(pending_mutant),
+                                                      self.get_live_time(total_duration, covering_tests))
+        self.finish_mutant(pending_mutant, result, duration)
+
+    def finish_mutant(self, pending_mutant, result, duration):
+        pending_mutant.finish(result, duration)
+        pending_mutant.cancelled = result is None and self.is_time_budget_exceeded()
+
+    def get_prioritized_tests(self, pending_mutant):
+        if not self.tests_prioritizer:
+            return None
+        return self.tests_prioritizer.get_prioritized_tests(pending_mutant.module, pending_mutant.mutations)
+
     @utils.TimeRegister
-    def run_tests_with_mutant(self, total_duration, mutant_module, mutations, coverage_result):
-        suite = self.create_test_suite(mutant_module)
-        if coverage_result:
-            self.mark_not_covered_tests_as_skip(mutations, coverage_result, suite)
+    def run_tests_with_mutant(self, mutant_module, covering_tests=None, prioritized_tests=None, live_time=None):
+        if mutant_module is self.schema_module:
+            suite = self.load_test_suite(covering_tests)
+        else:
+            suite = self.create_test_suite(mutant_module, covering_tests)
+        if prioritized_tests is not None:
+            suite = self.tests_prioritizer.sort(suite, prioritized_tests)
         timer = utils.Timer()
-        result = self.run_mutation_test_runner(suite, total_duration)
-        timer.stop()
-        self.update_score_and_notify_views(result, timer.duration)
+        try:
+            if live_time is None:
+                result = utils.MutationTestResult()
+                with self.stdout_manager:
+                    suite.run(result)
+                result = result.serialize()
+            else:
+                result = self.run_mutation_test_runner(suite, live_time)
+        finally:
+            if mutant_module is not self.schema_module:
+                self.restore_loaded_modules()
+        return result, timer.stop()
+
+    def get_live_time(self, total_duration, covering_tests=None):
+        if covering_tests is not None:
+            duration = sum(self.test_durations.get(test_id, total_duration) for test_id in covering_tests)
+        else:
+            duration = total_duration
+        return self.limit_to_deadline(self.timeout_factor * max(duration, self.MIN_TESTS_DURATION))
+
+    def get_worker_live_time(self, total_duration, covering_tests=None):
+        return self.limit_to_deadline(self.get_live_time(total_duration, covering_tests) + self.tests_load_duration)
 
-    def run_mutation_test_runner(self, suite, total_duration):
-        live_time = self.timeout_factor * (total_duration if total_duration > 1 else 1)
+    def run_mutation_test_runner(self, suite, live_time):
         test_runner_class = utils.get_mutation_test_runner_class()
         test_runner = test_runner_class(suite=suite)
         with self.stdout_manager:
@@ -209,6 +807,129 @@ class MutationController(views.ViewNotifier):
             test_runner.terminate()
         return result
 
+    def submit_mutant(self, pending_mutant, target_module, mutant_ast, total_duration, coverage_result, schema=None):
+        self.start_mutant_task(pending_mutant, target_module, mutant_ast, total_duration, coverage_result, schema)
+        while self.worker_pool.is_full():
+            self.collect_finished_mutants()
+
+    def start_mutant_task(self, pending_mutant, target_module, mutant_ast, total_duration, coverage_result,
+                          schema=None):
+        if coverage_result:
+            covering_tests = self.get_covering_tests(pending_mutant.mutations, coverage_result)
+        else:
+            covering_tests = None
+        prioritized_tests = self.get_prioritized_tests(pending_mutant)
+        schema_mutant_id = schema.get_mutant_id(pending_mutant.mutations) if schema else None
+        if schema_mutant_id:
+            task = (target_module.__name__, None, covering_tests, schema_mutant_id, prioritized_tests)
+            context = (target_module.__name__, schema.code)
+        else:
+            try:
+                code = compile(mutant_ast, target_module.__name__, 'exec')
+            except BaseException as exception:
+                pending_mutant.finish(self.get_incompetent_result(exception), 0)
+                return
+            task = (target_module.__name__, marshal.dumps(code), covering_tests, None, prioritized_tests)
+            context = None
+        live_time = self.get_worker_live_time(total_duration, covering_tests)
+        self.worker_pool.start(pending_mutant.number, task, live_time, context)
+
+    def submit_work(self, pending_mutant, target_module, mutant_index):
+        self.coordinator.start(pending_mutant.number, (target_module.__name__, mutant_index))
+        while self.coordinator.is_full():
+            self.collect_finished_mutants()
+
+    def run_mutant_task(self, task, context=None):
+        module_name, code, covering_tests, schema_mutant_id, prioritized_tests = task
+        if schema_mutant_id:
+            mutant_module = self.activate_schema_mutant(module_name, context, schema_mutant_id)
+        else:
+            self.schema_module = None
+            try:
+                mutant_module = self.create_mutant_module(module_name, marshal.loads(code))
+            except BaseException as exception:
+                return self.get_incompetent_result(exception)
+        result, _ = self.run_tests_with_mutant(mutant_module, covering_tests, prioritized_tests)
+        if self.schema_module:
+            schemata.activate_mutant(self.schema_module, 0)
+            if not result.is_survived or self.schema_state.is_changed():
+                self.schema_module = None
+        return result
+
+    def activate_schema_mutant(self, module_name, schema_code, schema_mutant_id):
+        if schema_code is not None:
+            self.schema_code = schema_code
+            self.schema_module = None
+        if self.schema_module is None:
+            with self.stdout_manager:
+                self.schema_module = schemata.create_schema_module(marshal.loads(self.schema_code), module_name)
+            self.create_test_suite(self.schema_module)
+            self.schema_state = schemata.ModulesState(self.get_schema_state_modules(module_name))
+        schemata.activate_mutant(self.schema_module, schema_mutant_id)
+        return self.schema_module
+
+    def get_schema_state_modules(self, module_name):
+        if self.modules_graph is not None:
+            names = self.get_modules_to_reload(module_name)
+        else:
+            names = set(sys.modules.keys()) - self.init_modules
+        names = names - self.test_modules_names - {module_name}
+        return [self.schema_module] + [sys.modules[name] for name in sorted(names) if name in sys.modules]
+
+    def get_incompetent_result(self, exception):
+        return utils.SerializableMutationTestResult(
+            is_incompetent=True,
+            is_survived=False,
+            killer=None,
+            exception_traceback=None,
+            exception=exception,
+            tests_run=0,
+        )
+
+    def collect_finished_mutants(self):
+        for number, result, duration in (self.coordinator or self.worker_pool).wait_for_results():
+            self.finish_mutant(self.pending_mutants[number], result, duration)
+        self.notify_finished_mutants()
+
+    def collect_pending_mutants(self):
+        while self.pending_mutants:
+            self.collect_finished_mutants()
+
+    def notify_finished_mutants(self):
+        while self.pending_mutants:
+            pending_mutant = next(iter(self.pending_mutants.values()))
+            if pending_mutant.duplicate_of and pending_mutant.duplicate_of.finished:
+                pending_mutant.finish(pending_mutant.duplicate_of.result, pending_mutant.duplicate_of.duration)
+            if not pending_mutant.finished:
+                break
+            del self.pending_mutants[pending_mutant.number]
+            if pending_mutant.cancelled:
+                continue
+            if pending_mutant.cache_key and pending_mutant.result is not None and \
+                    not isinstance(pending_mutant.result.exception, distributed.WorkUnitFailed):
+                self.results_cache.set(pending_mutant.cache_key, pending_mutant.result, pending_mutant.duration)
+            self.notify_mutation(pending_mutant.number, pending_mutant.mutations, pending_mutant.module,
+                                 pending_mutant.mutant)
+            if pending_mutant.equivalent:
+                self.update_equivalent_mutant()
+            else:
+                self.update_score_and_notify_views(pending_mutant.result, pending_mutant.duration)
+                if self.tests_prioritizer and pending_mutant.result:
+                    self.tests_prioritizer.add_killer(pending_mutant.module, pending_mutant.mutations,
+                                                      pending_mutant.result.killer)
+            self.add_score_sample(pending_mutant)
+            pending_mutant.mutations = pending_mutant.mutant = None
+
+    def add_score_sample(self, pending_mutant):
+        sampler = self.mutant_generator.sampler
+        result = pending_mutant.result
+        if not sampler.is_sampling():
+            return
+        mutation = pending_mutant.mutations[0]
+        stratum = sampler.get_stratum(pending_mutant.module, mutation.operator.name(), mutation.node)
+        competent = not pending_mutant.equivalent and not (result and result.is_incompetent)
+        self.score.add_sample(stratum, not (result and result.is_survived), competent)
+
     def update_score_and_notify_views(self, result, mutant_duration):
         if not result:
             self.update_timeout_mutant(mutant_duration)
@@ -219,6 +940,10 @@ class MutationController(views.ViewNotifier):
         else:
             self.update_killed_mutant(result, mutant_duration)
 
+    def update_equivalent_mutant(self):
+        self.notify_equivalent()
+        self.score.inc_equivalent()
+
     def update_timeout_mutant(self, duration):
         self.notify_timeout(duration)
         self.score.inc_timeout()
@@ -239,12 +964,46 @@ class MutationController(views.ViewNotifier):
         test_runner_class = utils.get_mutation_test_runner_class()
         test_runner = test_runner_class(suite=unittest.TestSuite())
         test_runner.start()
-        self.init_modules = list(sys.modules.keys())
+        self.init_modules = set(sys.modules.keys())
 
-    def remove_loaded_modules(self):
-        for module in list(sys.modules.keys()):
-            if module not in self.init_modules:
-                del sys.modules[module]
+    def remove_loaded_modules(self, changed_module=None, kept_modules=()):
+        if changed_module is None or self.modules_graph is None:
+            to_remove = set(sys.modules.keys()) - self.init_modules
+        else:
+            to_remove = self.get_modules_to_reload(changed_module)
+            to_remove.update(set(sys.modules.keys()) - self.init_modules - self.modules_graph.modules)
+            to_remove.difference_update(kept_modules)
+        for module in to_remove:
+            removed_module = sys.modules.pop(module, None)
+            parent, _, child = module.rpartition('.')
+            if removed_module is not None and parent and parent not in to_remove and \
+                    getattr(sys.modules.get(parent), child, None) is removed_module:
+                delattr(sys.modules[parent], child)
+
+    def get_modules_to_reload(self, changed_module):
+        if changed_module not in self.modules_to_reload:
+            modules = self.modules_graph.get_dependents(changed_module) - self.init_modules
+            modules.add(changed_module)
+            self.modules_to_reload[changed_module] = modules
+        return set(self.modules_to_reload[changed_module])
+
+    def get_kept_modules(self, changed_module):
+        if changed_module not in self.kept_modules:
+            modules_to_reload = self.get_modules_to_reload(changed_module)
+            kept_modules = {name for name in modules_to_reload & self.test_modules_names if name in sys.modules}
+            kept_modules.discard(changed_module)
+            changed = True
+            while changed:
+                replaced_modules = [sys.modules[name] for name in modules_to_reload - kept_modules
+                                    if name in sys.modules]
+                changed = False
+                for name in sorted(kept_modules):
+                    if not utils.ReferencesPatcher.is_patchable(sys.modules[name], replaced_modules):
+                        kept_modules.remove(name)
+                        changed = True
+                        break
+            self.kept_modules[changed_module] = kept_modules
+        return set(self.kept_modules[changed_module])
 
 
 class HOMStrategy:
@@ -256,8 +1015,8 @@ class HOMStrategy:
         for mutation_to_apply in mutations_to_apply:
             for available_mutation in available_mutations[:]:
                 if mutation_to_apply.node == available_mutation.node or \
-                   mutation_to_apply.node in available_mutation.node.children or \
-                   available_mutation.node in mutation_to_apply.node.children or \
+                   utils.is_descendant(mutation_to_apply.node, available_mutation.node) or \
+                   utils.is_descendant(available_mutation.node, mutation_to_apply.node) or \
                    (not allow_same_operators and mutation_to_apply.operator == available_mutation.operator):
                     available_mutations.remove(available_mutation)
 
@@ -356,14 +1115,27 @@ hom_strategies = [
 
 class FirstOrderMutator:
 
-    def __init__(self, operators, percentage=100):
+    def __init__(self, operators, percentage=100, seed=0, strata=()):
         self.operators = operators
-        self.sampler = utils.RandomSampler(percentage)
+        self.sampler = utils.MutationSampler(percentage, seed, strata)
 
-    def mutate(self, target_ast, to_mutate=None, coverage_injector=None, module=None):
-        for op in utils.sort_operators(self.operators):
-            for mutation, mutant in op().mutate(target_ast, to_mutate, self.sampler, coverage_injector, module=module):
-                yield [mutation], mutant
+    def collect_sites(self, target_ast, to_mutate=None, coverage_injector=None, module=None, lines=None):
+        traversal = operators.MutationTraversal(utils.sort_operators(self.operators))
+        traversal.collect_sites(target_ast, to_mutate, coverage_injector=coverage_injector, module=module, lines=lines)
+        return traversal
+
+    def count_candidates(self, traversal):
+        return self.sampler.get_strata_sizes(traversal.get_candidates())
+
+    def mutate(self, target_ast, to_mutate=None, coverage_injector=None, module=None, lines=None, traversal=None):
+        if traversal is None:
+            traversal = operators.MutationTraversal(utils.sort_operators(self.operators))
+            mutations = traversal.mutate(target_ast, to_mutate, self.sampler, coverage_injector, module=module,
+                                         lines=lines)
+        else:
+            mutations = traversal.mutate_sites(target_ast, self.sampler)
+        for mutation, mutant in mutations:
+            yield [mutation], mutant
 
 
 class HighOrderMutator(FirstOrderMutator):
@@ -372,8 +1144,8 @@ class HighOrderMutator(FirstOrderMutator):
         super().__init__(*args, **kwargs)
         self.hom_strategy = hom_strategy or FirstToLastHOMStrategy(order=2)
 
-    def mutate(self, target_ast, to_mutate=None, coverage_injector=None, module=None):
-        mutations = self.generate_all_mutations(coverage_injector, module, target_ast, to_mutate)
+    def mutate(self, target_ast, to_mutate=None, coverage_injector=None, module=None, lines=None, traversal=None):
+        mutations = self.generate_all_mutations(coverage_injector, module, target_ast, to_mutate, lines, traversal)
         for mutations_to_apply in self.hom_strategy.generate(mutations):
             generators = []
             applied_mutations = []
@@ -396,12 +1168,12 @@ class HighOrderMutator(FirstOrderMutator):
             yield applied_mutations, mutant
             self.finish_generators(generators)
 
-    def generate_all_mutations(self, coverage_injector, module, target_ast, to_mutate):
-        mutations = []
-        for op in utils.sort_operators(self.operators):
-            for mutation, _ in op().mutate(target_ast, to_mutate, None, coverage_injector, module=module):
-                mutations.append(mutation)
-        return mutations
+    def generate_all_mutations(self, coverage_injector, module, target_ast, to_mutate, lines=None, traversal=None):
+        if traversal is not None:
+            return [mutation for mutation, _ in traversal.mutate_sites(target_ast)]
+        traversal = operators.MutationTraversal(utils.sort_operators(self.operators))
+        return [mutation for mutation, _ in traversal.mutate(target_ast, to_mutate, None, coverage_injector,
+                                                              module=module, lines=lines)]
 
     def finish_generators(self, generators):
         for generator in reversed(generators):
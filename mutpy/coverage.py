@@ -1,9 +1,14 @@
+import array
 import ast
 import copy
+import dis
+import sys
+import types
 import unittest
 from mutpy import utils
 
 COVERAGE_SET_NAME = '__covered_nodes__'
+MONITORING_TOOL_ID = 1
 
 
 class MarkerNodeTransformer(ast.NodeTransformer):
@@ -53,9 +58,7 @@ class AbstractCoverageNodeTransformer(ast.NodeTransformer):
         else:
             markers = self.get_included_markers(node)
         coverage_node = utils.create_ast('{}.update({})'.format(COVERAGE_SET_NAME, repr(markers))).body[0]
-        coverage_node.lineno = node.lineno
-        coverage_node.col_offset = node.col_offset
-        return coverage_node
+        return ast.copy_location(coverage_node, node)
 
     def is_future_statement(self, node):
         return isinstance(node, ast.ImportFrom) and node.module == '__future__'
@@ -147,11 +150,29 @@ CoverageNodeTransformer = utils.get_by_python_version([
 ])
 
 
-class CoverageInjector:
+class AbstractCoverageInjector:
 
     def __init__(self):
         self.covered_nodes = set()
 
+    def inject(self, node, module_name='coverage'):
+        raise NotImplementedError()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def is_covered(self, child_node):
+        return child_node.marker in self.covered_nodes
+
+    def get_result(self):
+        return len(self.covered_nodes), self.marker_transformer.last_marker
+
+
+class CoverageInjector(AbstractCoverageInjector):
+
     def inject(self, node, module_name='coverage'):
         self.covered_nodes.clear()
         self.marker_transformer = MarkerNodeTransformer()
@@ -165,11 +186,218 @@ class CoverageInjector:
                 module_dict={COVERAGE_SET_NAME: self.covered_nodes},
             )
 
-    def is_covered(self, child_node):
-        return child_node.marker in self.covered_nodes
 
-    def get_result(self):
-        return len(self.covered_nodes), self.marker_transformer.last_marker
+def get_code_lines(code):
+    lines = {line for _, line in dis.findlinestarts(code) if line is not None}
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            lines |= get_code_lines(const)
+    return lines
+
+
+class CoverageLineMapper:
+
+    def __init__(self, code_lines):
+        self.code_lines = code_lines
+        self.transformer = CoverageNodeTransformer()
+        self.coverable_nodes = tuple(self.transformer.get_coverable_nodes())
+        self.line_markers = {}
+        self.entry_markers = {}
+
+    def map(self, node):
+        self.map_children(node, (self.entry_markers, 1))
+        return self.line_markers, self.entry_markers
+
+    def map_statements(self, statements, fallback):
+        for index, statement in enumerate(statements):
+            target = self.get_target(statements[index:], fallback)
+            if isinstance(statement, ast.ExceptHandler):
+                target = self.get_target(statement.body, (self.line_markers, statement.lineno))
+            if target and isinstance(statement, self.coverable_nodes) and \
+                    not self.transformer.is_future_statement(statement):
+                markers, line = target
+                markers.setdefault(line, set()).update(self.get_markers(statement))
+            if isinstance(statement, (ast.FunctionDef, ast.ClassDef)):
+                self.map_children(statement, (self.entry_markers, self.get_first_line(statement)))
+            else:
+                self.map_children(statement, None)
+
+    def map_children(self, node, fallback):
+        for _, value in ast.iter_fields(node):
+            if isinstance(value, list) and value and isinstance(value[0], (ast.stmt, ast.excepthandler)):
+                self.map_statements(value, fallback)
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        self.map_children(item, fallback)
+            elif isinstance(value, ast.AST):
+                self.map_children(value, fallback)
+
+    def get_target(self, statements, fallback):
+        for statement in statements:
+            if statement.lineno in self.code_lines:
+                return self.line_markers, statement.lineno
+        return fallback
+
+    def get_markers(self, node):
+        if hasattr(node, 'body'):
+            return self.transformer.get_markers_from_body_node(node)
+        return self.transformer.get_included_markers(node)
+
+    def get_first_line(self, node):
+        return min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+
+
+class TracingCoverageInjector(AbstractCoverageInjector):
+    """Collects coverage with line events instead of instrumented statements.
+
+    Executed lines of the original module are mapped back to markers of the
+    statements starting on them. `sys.monitoring` is used when available,
+    otherwise `sys.settrace`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.line_markers = {}
+        self.entry_markers = {}
+        self.filename = None
+        self.monitoring = getattr(sys, 'monitoring', None)
+        self.monitoring_active = False
+        self.previous_trace = None
+
+    def inject(self, node, module_name='coverage'):
+        self.covered_nodes.clear()
+        self.marker_transformer = MarkerNodeTransformer()
+        marker_node = self.marker_transformer.visit(node)
+        self.covered_nodes.add(marker_node.marker)
+        code = compile(marker_node, module_name, 'exec')
+        self.filename = code.co_filename
+        self.line_markers, self.entry_markers = CoverageLineMapper(get_code_lines(code)).map(marker_node)
+        with utils.StdoutManager():
+            self.start()
+            try:
+                return utils.create_module_from_code(code, module_name)
+            finally:
+                self.stop()
+
+    def start(self):
+        if self.monitoring and self.start_monitoring():
+            return
+        self.previous_trace = sys.gettrace()
+        sys.settrace(self.trace)
+
+    def start_monitoring(self):
+        try:
+            self.monitoring.use_tool_id(MONITORING_TOOL_ID, 'mutpy')
+        except ValueError:
+            return False
+        events = self.monitoring.events
+        self.monitoring.register_callback(MONITORING_TOOL_ID, events.PY_START, self.monitor_start)
+        self.monitoring.register_callback(MONITORING_TOOL_ID, events.LINE, self.monitor_line)
+        self.monitoring.set_events(MONITORING_TOOL_ID, events.PY_START | events.LINE)
+        self.monitoring.restart_events()
+        self.monitoring_active = True
+        return True
+
+    def stop(self):
+        if self.monitoring_active:
+            events = self.monitoring.events
+            self.monitoring.set_events(MONITORING_TOOL_ID, events.NO_EVENTS)
+            self.monitoring.register_callback(MONITORING_TOOL_ID, events.PY_START, None)
+            self.monitoring.register_callback(MONITORING_TOOL_ID, events.LINE, None)
+            self.monitoring.free_tool_id(MONITORING_TOOL_ID)
+            self.monitoring_active = False
+        else:
+            sys.settrace(self.previous_trace)
+            self.previous_trace = None
+
+    def trace(self, frame, event, arg):
+        if frame.f_code.co_filename != self.filename:
+            return None
+        self.cover(self.entry_markers, frame.f_code.co_firstlineno)
+        return self.trace_lines
+
+    def trace_lines(self, frame, event, arg):
+        if event == 'line':
+            self.cover(self.line_markers, frame.f_lineno)
+        return self.trace_lines
+
+    def monitor_start(self, code, instruction_offset):
+        if code.co_filename == self.filename:
+            self.cover(self.entry_markers, code.co_firstlineno)
+        return self.monitoring.DISABLE
+
+    def monitor_line(self, code, line_number):
+        if code.co_filename == self.filename:
+            self.cover(self.line_markers, line_number)
+        return self.monitoring.DISABLE
+
+    def cover(self, markers_by_line, line):
+        markers = markers_by_line.get(line)
+        if markers:
+            self.covered_nodes.update(markers)
+
+
+coverage_backends = {
+    'inject': CoverageInjector,
+    'trace': TracingCoverageInjector,
+}
+
+
+class CoverageMatrix:
+    """Test-by-node coverage matrix.
+
+    Every covered node keeps a bitset column with one bit per test. Nodes
+    covered before tests are run (e.g. module level statements) are covered
+    by all tests.
+    """
+
+    def __init__(self, always_covered_nodes=()):
+        self.tests = []
+        self.always_covered_nodes = set(always_covered_nodes)
+        self.node_tests = {}
+        self.columns = {}
+
+    def add_test(self, test_name, covered_nodes):
+        test_index = len(self.tests)
+        self.tests.append(test_name)
+        for node in covered_nodes:
+            if node not in self.always_covered_nodes:
+                self.node_tests.setdefault(node, array.array('I')).append(test_index)
+        self.columns.clear()
+
+    def get_all_tests(self):
+        return (1 << len(self.tests)) - 1
+
+    def get_column(self, node):
+        if node in self.always_covered_nodes:
+            return self.get_all_tests()
+        if node not in self.columns:
+            bits = bytearray((len(self.tests) + 7) // 8)
+            for test_index in self.node_tests.get(node, ()):
+                bits[test_index >> 3] |= 1 << (test_index & 7)
+            self.columns[node] = int.from_bytes(bits, 'little')
+        return self.columns[node]
+
+    def get_covering_tests(self, nodes):
+        tests = 0
+        for node in nodes:
+            tests |= self.get_column(node)
+        return tests
+
+    def get_covering_test_names(self, nodes):
+        return self.get_test_names(self.get_covering_tests(nodes))
+
+    def get_not_covered_tests(self, nodes):
+        return self.get_test_names(self.get_all_tests() & ~self.get_covering_tests(nodes))
+
+    def get_test_names(self, tests):
+        names = []
+        while tests:
+            lowest_bit = tests & -tests
+            names.append(self.tests[lowest_bit.bit_length() - 1])
+            tests ^= lowest_bit
+        return names
 
 
 class CoverageTestResult(unittest.TestResult):
@@ -178,14 +406,16 @@ class CoverageTestResult(unittest.TestResult):
         super().__init__(*args, **kwargs)
         self.coverage_injector = coverage_injector
         self.always_covered_nodes = coverage_injector.covered_nodes.copy()
-        self.test_covered_nodes = {}
+        self.coverage_matrix = CoverageMatrix(self.always_covered_nodes)
 
     def startTest(self, test):
         super().startTest(test)
         self.covered_nodes = self.coverage_injector.covered_nodes.copy()
         self.coverage_injector.covered_nodes.clear()
+        self.coverage_injector.start()
 
     def stopTest(self, test):
+        self.coverage_injector.stop()
         super().stopTest(test)
-        self.test_covered_nodes[repr(test)] = self.coverage_injector.covered_nodes.copy() | self.always_covered_nodes
+        self.coverage_matrix.add_test(test.id(), self.coverage_injector.covered_nodes)
         self.coverage_injector.covered_nodes.update(self.covered_nodes)
@@ -0,0 +1,240 @@
+import collections
+import multiprocessing
+import multiprocessing.connection
+import pickle
+import random
+import socket
+import threading
+from mutpy import utils
+
+
+class WorkUnitFailed(Exception):
+    pass
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or 'localhost', int(port)
+
+
+class Coordinator:
+    """Serves mutants to remote workers as work units.
+
+    A work unit is a module name with a range of mutant indexes in the
+    module mutants stream. Workers regenerate these mutants, run tests and
+    send back a list of ``(index, result, duration)`` tuples. Connections
+    are authenticated with a shared key before any message is unpickled.
+    Worker which doesn't finish its unit in `unit_timeout` seconds is
+    disconnected and the unit is sent to another worker. Mutants of a unit
+    which lost `MAX_UNIT_RETRIES` + 1 workers are reported as incompetent.
+    """
+    UNIT_SIZE = 10
+    UNIT_SETUP_TIME = 60
+    MAX_UNIT_RETRIES = 2
+
+    def __init__(self, address, config, authkey, unit_size=UNIT_SIZE):
+        self.config = config
+        self.unit_size = unit_size
+        self.seed = random.random()
+        self.sampler = None
+        self.listener = multiprocessing.connection.Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.keys = {}
+        self.units = collections.deque()
+        self.current_unit = None
+        self.idle_workers = []
+        self.busy_workers = {}
+        self.deadlines = {}
+        self.unit_timeout = None
+        self.retries = collections.Counter()
+        self.failed = []
+        self.accepted_workers = collections.deque()
+        self.wakeup_reader, self.wakeup_writer = multiprocessing.Pipe(duplex=False)
+        self.closed = False
+        self.accept_thread = threading.Thread(target=self.accept_workers, daemon=True)
+        self.accept_thread.start()
+
+    def start(self, key, task):
+        module_name, index = task
+        self.keys[module_name, index] = key
+        if self.current_unit:
+            unit_module_name, start, stop = self.current_unit
+            if unit_module_name == module_name and stop == index and stop - start < self.unit_size:
+                self.current_unit = (module_name, start, index + 1)
+                return
+            self.flush_unit()
+        self.current_unit = (module_name, index, index + 1)
+
+    def flush_unit(self):
+        if self.current_unit:
+            self.units.append(self.current_unit)
+            self.current_unit = None
+
+    def is_full(self):
+        return len(self.units) >= max(1, len(self.idle_workers) + len(self.busy_workers))
+
+    def get_capacity(self):
+        return max(1, len(self.idle_workers) + len(self.busy_workers)) * self.unit_size
+
+    def set_mutant_live_time(self, live_time):
+        self.unit_timeout = self.UNIT_SETUP_TIME + self.unit_size * live_time
+
+    def get_timeout(self):
+        if not self.deadlines:
+            return None
+        return max(0, min(self.deadlines.values()) - utils.Timer.time_provider())
+
+    def wait_for_results(self):
+        self.flush_unit()
+        self.dispatch()
+        finished, self.failed = self.failed, []
+        if finished or not (self.units or self.busy_workers):
+            return finished
+        connections = [self.wakeup_reader] + self.idle_workers + list(self.busy_workers)
+        for connection in multiprocessing.connection.wait(connections, self.get_timeout()):
+            if connection is self.wakeup_reader:
+                self.add_accepted_workers()
+                continue
+            try:
+                results = connection.recv()
+            except (OSError, EOFError, pickle.UnpicklingError):
+                self.remove_worker(connection)
+                continue
+            if connection not in self.busy_workers:
+                self.remove_worker(connection)
+                continue
+            unit = self.busy_workers.pop(connection)
+            self.deadlines.pop(connection, None)
+            self.retries.pop(unit, None)
+            self.idle_workers.append(connection)
+            module_name, _, _ = unit
+            for index, result, duration in results:
+                finished.append((self.keys.pop((module_name, index)), result, duration))
+        self.remove_expired_workers()
+        self.dispatch()
+        finished += self.failed
+        self.failed = []
+        return finished
+
+    def remove_expired_workers(self):
+        now = utils.Timer.time_provider()
+        for connection, deadline in list(self.deadlines.items()):
+            if deadline <= now:
+                self.remove_worker(connection)
+
+    def accept_workers(self):
+        """Authenticates connecting workers in background thread."""
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                continue
+            if self.closed:
+                connection.close()
+                break
+            self.accepted_workers.append(connection)
+            try:
+                self.wakeup_writer.send_bytes(b'')
+            except OSError:
+                break
+
+    def add_accepted_workers(self):
+        while self.wakeup_reader.poll():
+            self.wakeup_reader.recv_bytes()
+        while self.accepted_workers:
+            connection = self.accepted_workers.popleft()
+            try:
+                connection.send((self.config, self.seed, self.sampler))
+            except OSError:
+                connection.close()
+                continue
+            self.idle_workers.append(connection)
+
+    def dispatch(self):
+        while self.idle_workers and self.units:
+            connection = self.idle_workers.pop()
+            unit = self.units.popleft()
+            self.busy_workers[connection] = unit
+            if self.unit_timeout is not None:
+                self.deadlines[connection] = utils.Timer.time_provider() + self.unit_timeout
+            try:
+                connection.send(unit)
+            except OSError:
+                self.remove_worker(connection)
+
+    def remove_worker(self, connection):
+        connection.close()
+        if connection in self.idle_workers:
+            self.idle_workers.remove(connection)
+        self.deadlines.pop(connection, None)
+        unit = self.busy_workers.pop(connection, None)
+        if not unit:
+            return
+        self.retries[unit] += 1
+        if self.retries[unit] <= self.MAX_UNIT_RETRIES:
+            self.units.appendleft(unit)
+        else:
+            self.fail_unit(unit)
+
+    def fail_unit(self, unit):
+        del self.retries[unit]
+        module_name, start, stop = unit
+        exception = WorkUnitFailed('{} workers were lost while running mutants {}-{} of {}'.format(
+            self.MAX_UNIT_RETRIES + 1, start, stop - 1, module_name))
+        result = utils.SerializableMutationTestResult(
+            is_incompetent=True,
+            is_survived=False,
+            killer=None,
+            exception_traceback=None,
+            exception=exception,
+            tests_run=0,
+        )
+        for index in range(start, stop):
+            self.failed.append((self.keys.pop((module_name, index)), result, 0))
+
+    def close(self):
+        self.closed = True
+        self.wake_accept_thread()
+        self.listener.close()
+        for connection in self.idle_workers:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for connection in self.idle_workers + list(self.busy_workers) + list(self.accepted_workers):
+            connection.close()
+        self.idle_workers = []
+        self.busy_workers.clear()
+        self.deadlines.clear()
+        self.accepted_workers.clear()
+        self.wakeup_reader.close()
+        self.wakeup_writer.close()
+
+    def wake_accept_thread(self):
+        host, port = self.address
+        if host in ('', '0.0.0.0'):
+            host = '127.0.0.1'
+        try:
+            socket.create_connection((host, port)).close()
+        except OSError:
+            pass
+
+
+class Worker:
+
+    def __init__(self, address, authkey):
+        self.connection = multiprocessing.connection.Client(address, authkey=authkey)
+        self.config, self.seed, self.sampler = self.connection.recv()
+
+    def serve(self, handler):
+        try:
+            while True:
+                try:
+                    unit = self.connection.recv()
+                except EOFError:
+                    break
+                if unit is None:
+                    break
+                self.connection.send(handler(unit))
+        finally:
+            self.connection.close()
@@ -0,0 +1,55 @@
+import json
+import os
+
+
+def get_mutation_key(mutation):
+    return mutation.operator.name(), mutation.visitor, getattr(mutation.node, 'index', None)
+
+
+class MutationJournal:
+    """Append-only log of mutants verdicts, one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.truncated = False
+        self.journal_file = None
+        self.load()
+
+    @staticmethod
+    def get_key(module, mutations):
+        return module, tuple((mutation['operator'], mutation['visitor'], mutation['node']) for mutation in mutations)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as journal_file:
+            for line in journal_file:
+                self.truncated = not line.endswith('\n')
+                try:
+                    entry = json.loads(line)
+                    key = self.get_key(entry['module'], entry['mutations'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self.entries[key] = entry
+
+    def get(self, module, mutations):
+        key = module, tuple(get_mutation_key(mutation) for mutation in mutations)
+        return self.entries.get(key)
+
+    def append(self, entry):
+        key = self.get_key(entry['module'], entry['mutations'])
+        if key in self.entries:
+            return
+        self.entries[key] = entry
+        if self.journal_file is None:
+            self.journal_file = open(self.path, 'a')
+            if self.truncated:
+                self.journal_file.write('\n')
+        self.journal_file.write(json.dumps(entry) + '\n')
+        self.journal_file.flush()
+
+    def close(self):
+        if self.journal_file:
+            self.journal_file.close()
+            self.journal_file = None
@@ -1,6 +1,6 @@
 import ast
+import bisect
 import re
-import copy
 import functools
 from mutpy import utils
 
@@ -19,54 +19,81 @@ class Mutation:
 
 def copy_node(mutate):
     def f(self, node):
-        copied_node = copy.deepcopy(node, memo={
-            id(node.parent): node.parent,
-        })
-        return mutate(self, copied_node)
+        self.record_node(node)
+        return mutate(self, node)
     return f
 
 
 class MutationOperator:
 
-    def mutate(self, node, to_mutate=None, sampler=None, coverage_injector=None, module=None, only_mutation=None):
+    def mutate(self, node, to_mutate=None, sampler=None, coverage_injector=None, module=None, only_mutation=None,
+               lines=None):
+        self.set_context(to_mutate, sampler, coverage_injector, module, only_mutation, lines)
+        for new_node in self.visit(node):
+            yield Mutation(operator=self.__class__, node=self.current_node, visitor=self.visitor), new_node
+
+    def set_context(self, to_mutate=None, sampler=None, coverage_injector=None, module=None, only_mutation=None,
+                    lines=None):
         self.to_mutate = to_mutate
+        self.lines = lines
         self.sampler = sampler
         self.only_mutation = only_mutation
         self.coverage_injector = coverage_injector
         self.module = module
-        for new_node in self.visit(node):
-            yield Mutation(operator=self.__class__, node=self.current_node, visitor=self.visitor), new_node
+        self.undo_log = []
 
     def visit(self, node):
         if self.has_notmutate(node) or (self.coverage_injector and not self.coverage_injector.is_covered(node)):
             return
-        if self.only_mutation and self.only_mutation.node != node and self.only_mutation.node not in node.children:
+        if self.only_mutation and self.only_mutation.node != node and hasattr(node, 'end_index') and \
+                not utils.is_descendant(self.only_mutation.node, node):
             return
         self.fix_lineno(node)
-        visitors = self.find_visitors(node)
+        visitors = self.find_visitors(node) if self.is_in_lines(node) else []
         if visitors:
             for visitor in visitors:
                 try:
-                    if self.sampler and not self.sampler.is_mutation_time():
-                        raise MutationResign
-                    if self.only_mutation and \
-                            (self.only_mutation.node != node or self.only_mutation.visitor != visitor.__name__):
-                        raise MutationResign
-                    new_node = visitor(node)
-                    self.visitor = visitor.__name__
-                    self.current_node = node
-                    self.fix_node_internals(node, new_node)
-                    ast.fix_missing_locations(new_node)
-                    yield new_node
+                    yield self.apply_visitor(node, visitor)
                 except MutationResign:
                     pass
                 finally:
+                    self.undo()
                     for new_node in self.generic_visit(node):
                         yield new_node
         else:
             for new_node in self.generic_visit(node):
                 yield new_node
 
+    def apply_visitor(self, node, visitor):
+        if self.sampler and not self.sampler.is_mutation_time(self.get_module_name(), self.name(), visitor.__name__,
+                                                              node):
+            raise MutationResign
+        if self.only_mutation and \
+                (self.only_mutation.node != node or self.only_mutation.visitor != visitor.__name__):
+            raise MutationResign
+        new_node = visitor(node)
+        self.visitor = visitor.__name__
+        self.current_node = node
+        self.fix_node_internals(node, new_node)
+        ast.fix_missing_locations(new_node)
+        return new_node
+
+    def get_module_name(self):
+        return getattr(self.module, '__name__', None)
+
+    def record_node(self, node):
+        fields = [(field, value, value[:] if isinstance(value, list) else None)
+                  for field, value in ast.iter_fields(node)]
+        self.undo_log.append((node, fields))
+
+    def undo(self):
+        while self.undo_log:
+            node, fields = self.undo_log.pop()
+            for field, value, items in fields:
+                setattr(node, field, value)
+                if items is not None:
+                    value[:] = items
+
     def generic_visit(self, node):
         for field, old_value in ast.iter_fields(node):
             if isinstance(old_value, list):
@@ -112,24 +139,34 @@ class MutationOperator:
         except AttributeError:
             return False
 
+    def is_in_lines(self, node):
+        return self.lines is None or getattr(node, 'lineno', None) in self.lines
+
     def fix_lineno(self, node):
         if not hasattr(node, 'lineno') and getattr(node, 'parent', None) is not None and hasattr(node.parent, 'lineno'):
             node.lineno = node.parent.lineno
 
     def fix_node_internals(self, old_node, new_node):
         if not hasattr(new_node, 'parent'):
-            new_node.children = old_node.children
+            new_node.index = old_node.index
+            new_node.end_index = old_node.end_index
             new_node.parent = old_node.parent
         if hasattr(old_node, 'marker'):
             new_node.marker = old_node.marker
 
     def find_visitors(self, node):
-        method_prefix = 'mutate_' + node.__class__.__name__
-        return self.getattrs_like(method_prefix)
+        return [getattr(self, name) for name in self.get_visitors_table().get(node.__class__.__name__, ())]
 
-    def getattrs_like(ob, attr_like):
-        pattern = re.compile(attr_like + "($|(_\w+)+$)")
-        return [getattr(ob, attr) for attr in dir(ob) if pattern.match(attr)]
+    @classmethod
+    def get_visitors_table(cls):
+        if '_visitors_table' not in cls.__dict__:
+            table = {}
+            for attr in dir(cls):
+                if attr.startswith('mutate_') and callable(getattr(cls, attr)):
+                    node_type = attr.split('_')[1]
+                    table.setdefault(node_type, []).append(attr)
+            cls._visitors_table = table
+        return cls._visitors_table
 
     @classmethod
     def name(cls):
@@ -140,6 +177,115 @@ class MutationOperator:
         return ' '.join(map(str.lower, (re.split('([A-Z][a-z]*)', cls.__name__)[1::2])))
 
 
+class MutationTraversal:
+
+    def __init__(self, operators):
+        self.operators = [operator() for operator in operators]
+        self.visitors_table = {}
+        for operator_index, operator in enumerate(self.operators):
+            for node_type, visitors in operator.get_visitors_table().items():
+                self.visitors_table.setdefault(node_type, []).append((operator_index, visitors))
+
+    def mutate(self, node, to_mutate=None, sampler=None, coverage_injector=None, module=None, lines=None):
+        self.collect_sites(node, to_mutate, sampler, coverage_injector, module, lines)
+        yield from self.mutate_sites(node, sampler)
+
+    def mutate_sites(self, node, sampler=None):
+        for operator in self.operators:
+            operator.sampler = sampler
+        if sampler:
+            sampler.prepare(self.get_candidates())
+        for operator_index, operator in enumerate(self.operators):
+            sites = self.sites[operator_index]
+            site_indexes = [node_index for node_index, _ in sites]
+            for node_index, visitor_name in self.generate_sites(sites, site_indexes, 0, len(sites)):
+                for new_node in self.apply(operator, node_index, visitor_name):
+                    yield Mutation(operator=operator.__class__, node=operator.current_node,
+                                   visitor=operator.visitor), new_node if new_node is not None else node
+
+    def collect_sites(self, node, to_mutate=None, sampler=None, coverage_injector=None, module=None, lines=None):
+        self.base_operator = MutationOperator()
+        for operator in self.operators + [self.base_operator]:
+            operator.set_context(to_mutate, sampler, coverage_injector, module, lines=lines)
+        self.nodes = []
+        self.locations = []
+        self.ends = []
+        self.sites = [[] for _ in self.operators]
+        self.collect(node, location=None)
+
+    def get_candidates(self):
+        module_name = self.base_operator.get_module_name()
+        for operator, sites in zip(self.operators, self.sites):
+            for node_index, visitors in sites:
+                for visitor_name in visitors:
+                    yield module_name, operator.name(), visitor_name, self.nodes[node_index]
+
+    def collect(self, node, location):
+        coverage_injector = self.base_operator.coverage_injector
+        if self.base_operator.has_notmutate(node) or (coverage_injector and not coverage_injector.is_covered(node)):
+            return
+        self.base_operator.fix_lineno(node)
+        node_index = len(self.nodes)
+        self.nodes.append(node)
+        self.locations.append(location)
+        self.ends.append(None)
+        if self.base_operator.is_in_lines(node):
+            for operator_index, visitors in self.visitors_table.get(node.__class__.__name__, ()):
+                self.sites[operator_index].append((node_index, visitors))
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for position, item in enumerate(value):
+                    if isinstance(item, ast.AST):
+                        self.collect(item, (node, field, position))
+            elif isinstance(value, ast.AST):
+                self.collect(value, (node, field, None))
+        self.ends[node_index] = len(self.nodes)
+
+    def generate_sites(self, sites, site_indexes, start, stop):
+        position = start
+        while position < stop:
+            node_index, visitors = sites[position]
+            if len(visitors) == 1:
+                yield node_index, visitors[0]
+                position += 1
+            else:
+                subtree_stop = bisect.bisect_left(site_indexes, self.ends[node_index], position + 1, stop)
+                for visitor_name in visitors:
+                    yield node_index, visitor_name
+                    yield from self.generate_sites(sites, site_indexes, position + 1, subtree_stop)
+                position = subtree_stop
+
+    def apply(self, operator, node_index, visitor_name):
+        node = self.nodes[node_index]
+        try:
+            new_node = operator.apply_visitor(node, getattr(operator, visitor_name))
+        except MutationResign:
+            operator.undo()
+            return
+        location = self.locations[node_index]
+        if location is None:
+            yield new_node
+        else:
+            parent, field, position = location
+            if position is None:
+                if new_node is None:
+                    delattr(parent, field)
+                else:
+                    setattr(parent, field, new_node)
+                yield None
+                setattr(parent, field, node)
+            else:
+                old_value = getattr(parent, field)
+                old_values_copy = old_value[:]
+                if not isinstance(new_node, ast.AST):
+                    old_value[position:position+1] = new_node
+                else:
+                    old_value[position] = new_node
+                yield None
+                old_value[:] = old_values_copy
+        operator.undo()
+
+
 class AbstractUnaryOperatorDeletion(MutationOperator):
 
     def mutate_UnaryOp(self, node):
@@ -387,11 +533,14 @@ class HidingVariableDeletion(AbstractOverriddenElementModification):
             raise MutationResign()
         if not new_targets:
             return ast.Pass()
-        elif len(new_targets) == 1:
+        self.record_node(node)
+        if len(new_targets) == 1:
             node.targets = new_targets
             node.value = new_values[0]
             return node
         else:
+            self.record_node(target)
+            self.record_node(value)
             target.elts = new_targets
             value.elts = new_values
             return node
@@ -0,0 +1,192 @@
+import ast
+from mutpy import utils
+
+SCHEMA_MUTANT_NAME = '__mutpy_mutant__'
+
+
+def clone_node(node, replace=None):
+    if isinstance(node, ast.AST):
+        new_node = node.__class__()
+        for field, value in ast.iter_fields(node):
+            setattr(new_node, field, clone_node(value, replace))
+        for attr in node._attributes:
+            if hasattr(node, attr):
+                setattr(new_node, attr, getattr(node, attr))
+        return replace(node, new_node) if replace else new_node
+    elif isinstance(node, list):
+        return [clone_node(value, replace) for value in node]
+    else:
+        return node
+
+
+class StatementLocator(ast.NodeVisitor):
+
+    def __init__(self):
+        self.locations = {}
+        self.switchable = set()
+        self.function_depth = 0
+
+    def generic_visit(self, node):
+        is_function = isinstance(node, ast.FunctionDef)
+        if is_function:
+            self.function_depth += 1
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    if isinstance(item, ast.stmt):
+                        self.locations[id(item)] = (node, field, index)
+                        if self.function_depth:
+                            self.switchable.add(id(item))
+        super().generic_visit(node)
+        if is_function:
+            self.function_depth -= 1
+
+
+class MutantSchema:
+    """Collects statement-level variants of mutants of a single module.
+
+    Every mutated statement is replaced in the schema module by an if-chain
+    which selects a variant by the value of the global `SCHEMA_MUTANT_NAME`
+    (0 is the original program). Only statements inside functions can be
+    switched at runtime and only if they are not executed while the schema and
+    tests are imported (see `SwitchRecorder`) - other mutants should be run
+    separately. The schema module is shared by its mutants, so it should be
+    recreated after a mutant which is killed or changes state of modules (see
+    `ModulesState`).
+    """
+
+    def __init__(self, target_ast):
+        self.target_ast = target_ast
+        locator = StatementLocator()
+        locator.visit(target_ast)
+        self.locations = locator.locations
+        self.switchable = locator.switchable
+        self.variants = {}
+        self.mutant_ids = {}
+
+    @staticmethod
+    def get_key(mutations):
+        return tuple((mutation.operator, mutation.visitor, id(mutation.node)) for mutation in mutations)
+
+    def get_statement(self, node):
+        while node is not None and not isinstance(node, ast.stmt):
+            node = getattr(node, 'parent', None)
+        return node
+
+    def add_mutant(self, mutations):
+        statements = []
+        for mutation in mutations:
+            statement = self.get_statement(mutation.node)
+            if statement is None or id(statement) not in self.switchable:
+                return None
+            statements.append(statement)
+        statements = [statement for statement in statements
+                      if not any(self.is_ancestor(other, statement) for other in statements if other is not statement)]
+        mutant_id = len(self.mutant_ids) + 1
+        for statement in statements:
+            parent, field, index = self.locations[id(statement)]
+            variant = clone_node(getattr(parent, field)[index])
+            self.variants.setdefault(id(statement), []).append((mutant_id, variant))
+        self.mutant_ids[self.get_key(mutations)] = mutant_id
+        return mutant_id
+
+    def is_ancestor(self, node, descendant):
+        parent = getattr(descendant, 'parent', None)
+        while parent is not None:
+            if parent is node:
+                return True
+            parent = getattr(parent, 'parent', None)
+        return False
+
+    def remove_mutants(self, mutant_ids):
+        self.mutant_ids = {key: mutant_id for key, mutant_id in self.mutant_ids.items()
+                           if mutant_id not in mutant_ids}
+
+    def get_mutant_id(self, mutations):
+        return self.mutant_ids.get(self.get_key(mutations))
+
+    def create_schema_ast(self):
+        return clone_node(self.target_ast, replace=self.create_switch)
+
+    def create_switch(self, node, original):
+        if id(node) not in self.variants:
+            return original
+        switch = original
+        for mutant_id, variant in reversed(self.variants[id(node)]):
+            test = ast.Compare(
+                left=ast.Name(id=SCHEMA_MUTANT_NAME, ctx=ast.Load()),
+                ops=[ast.Eq()],
+                comparators=[ast.Num(n=mutant_id)],
+            )
+            switch = ast.copy_location(ast.If(test=test, body=[variant], orelse=[switch]), node)
+        return switch
+
+    def compile(self, module_name):
+        schema_ast = ast.fix_missing_locations(self.create_schema_ast())
+        return compile(schema_ast, module_name, 'exec')
+
+
+class SwitchRecorder:
+    """Active mutant id which records ids of all executed switches.
+
+    Results of code executed during import are computed only once, so
+    mutants of switches executed with it can't be activated later.
+    """
+
+    def __init__(self):
+        self.mutant_ids = set()
+
+    def __eq__(self, mutant_id):
+        self.mutant_ids.add(mutant_id)
+        return False
+
+    __hash__ = object.__hash__
+
+
+class ModulesState:
+    """Shallow snapshot of module and class level state of modules.
+
+    Mutants of a schema share its module, so a mutant which rebinds a global
+    or class attribute, or changes a list, dict or set stored in one, would
+    leak its state to the next mutants. Changes of other objects are not
+    detected.
+    """
+    CONTAINER_TYPES = (list, dict, set)
+
+    def __init__(self, modules):
+        self.sizes = []
+        self.entries = []
+        for module in modules:
+            for owner in utils.get_namespaces(module):
+                namespace = vars(owner)
+                self.sizes.append((namespace, len(namespace)))
+                for name, value in namespace.items():
+                    if name != '__builtins__':
+                        self.entries.append((namespace, name, value, self.copy_content(value)))
+
+    def copy_content(self, value):
+        if type(value) in self.CONTAINER_TYPES:
+            return type(value)(value)
+        return None
+
+    def is_changed(self):
+        if any(len(namespace) != size for namespace, size in self.sizes):
+            return True
+        for namespace, name, value, content in self.entries:
+            current = namespace.get(name)
+            if current is not value:
+                return True
+            try:
+                if content is not None and content != current:
+                    return True
+            except Exception:
+                return True
+        return False
+
+
+def create_schema_module(code, module_name, mutant_id=0):
+    return utils.create_module_from_code(code, module_name, module_dict={SCHEMA_MUTANT_NAME: mutant_id})
+
+
+def activate_mutant(schema_module, mutant_id):
+    setattr(schema_module, SCHEMA_MUTANT_NAME, mutant_id)
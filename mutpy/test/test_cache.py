@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from mutpy import cache, utils
+
+
+class ResultsCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        self.path = os.path.join(self.tmp, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def get_result(self, killer='test'):
+        return utils.SerializableMutationTestResult(
+            is_incompetent=False,
+            is_survived=False,
+            killer=killer,
+            exception_traceback='traceback',
+            exception=None,
+            tests_run=1,
+        )
+
+    def test_get_missing(self):
+        results_cache = cache.ResultsCache(self.path)
+
+        self.assertIsNone(results_cache.get('key'))
+
+    def test_set_and_get_after_reopen(self):
+        results_cache = cache.ResultsCache(self.path)
+        results_cache.set('key', self.get_result(), 0.5)
+        results_cache.close()
+
+        results_cache = cache.ResultsCache(self.path)
+
+        self.assertEqual(results_cache.get('key'), (self.get_result(), 0.5))
+
+    def test_cache_timeout(self):
+        results_cache = cache.ResultsCache(self.path)
+        results_cache.set('key', None, 5)
+
+        self.assertEqual(results_cache.get('key'), (None, 5))
+
+    def test_evict_least_recently_used(self):
+        results_cache = cache.ResultsCache(self.path)
+        results_cache.set('a', self.get_result('a'), 0)
+        results_cache.set('b', self.get_result('b'), 0)
+        results_cache.get('a')
+        results_cache.max_size = results_cache.get_size() - 1
+
+        results_cache.evict()
+
+        self.assertIsNotNone(results_cache.get('a'))
+        self.assertIsNone(results_cache.get('b'))
+
+    def test_get_key(self):
+        self.assertEqual(cache.ResultsCache.get_key('a', 1), cache.ResultsCache.get_key('a', 1))
+        self.assertNotEqual(cache.ResultsCache.get_key('a', 1), cache.ResultsCache.get_key('a1'))
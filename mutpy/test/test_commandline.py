@@ -18,3 +18,28 @@ class CommandLineTest(unittest.TestCase):
         mutator = commandline.build_mutator(
             parser.parse_args(['--operator', 'AOR']))
         self.assertEqual(1, len(mutator.operators))
+
+    def test_parse_time_budget(self):
+        parser = commandline.build_parser()
+
+        self.assertEqual(parser.parse_args(['--time-budget', '15m']).time_budget, 900)
+        self.assertEqual(parser.parse_args(['--time-budget', '2h']).time_budget, 7200)
+        self.assertEqual(parser.parse_args(['--time-budget', '90']).time_budget, 90)
+
+    def test_reject_time_budget_with_high_order_mutation(self):
+        parser = commandline.build_parser()
+
+        with self.assertRaises(SystemExit):
+            commandline.build_mutator(parser.parse_args(['--time-budget', '15m', '--order', '2']))
+
+    def test_inject_coverage_backend_is_default(self):
+        parser = commandline.build_parser()
+
+        self.assertEqual(parser.parse_args([]).coverage_backend, 'inject')
+        self.assertEqual(parser.parse_args(['--coverage-backend', 'trace']).coverage_backend, 'trace')
+
+    def test_reject_sampling_strata_with_high_order_mutation(self):
+        parser = commandline.build_parser()
+
+        with self.assertRaises(SystemExit):
+            commandline.build_mutator(parser.parse_args(['--sampling-strata', 'operator', '--order', '2']))
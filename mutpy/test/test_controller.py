@@ -1,8 +1,14 @@
 import ast
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
 import unittest
+import unittest.mock
 import types
 import sys
-from mutpy import controller, operators, utils, codegen
+from mutpy import cache, controller, operators, utils, codegen, journal, views, distributed
 
 
 class MutationScoreTest(unittest.TestCase):
@@ -47,6 +53,58 @@ class MutationScoreTest(unittest.TestCase):
         self.assertEqual(self.score.covered_nodes, 1)
         self.assertEqual(self.score.all_nodes, 1)
 
+    def test_confidence_interval_if_not_sampled(self):
+        self.assertIsNone(self.score.get_confidence_interval())
+
+    def test_confidence_interval(self):
+        for detected in [True] * 8 + [False] * 2:
+            self.score.add_sample(('AOR',), detected)
+        self.score.add_sample(('CRP',), False)
+        self.score.population = {('AOR',): 50, ('CRP',): 50}
+
+        low, high = self.score.get_confidence_interval()
+
+        self.assertLess(low, 40)
+        self.assertGreater(high, 40)
+        self.assertGreaterEqual(low, 0)
+
+    def test_confidence_interval_with_unknown_stratum(self):
+        for detected in [True, True, False, False]:
+            self.score.add_sample(('AOR',), detected)
+        self.score.population = {('AOR',): 4, ('CRP',): 4}
+
+        self.assertEqual(self.score.get_confidence_interval(), (25, 75))
+
+    def test_confidence_interval_if_all_mutants_sampled(self):
+        for detected in [True, True, False, False]:
+            self.score.add_sample((), detected)
+        self.score.population = {(): 4}
+
+        self.assertEqual(self.score.get_confidence_interval(), (50, 50))
+
+    def test_confidence_interval_excludes_incompetent_mutants(self):
+        for detected in [True, True, False]:
+            self.score.add_sample((), detected)
+        self.score.add_sample((), False, competent=False)
+        self.score.population = {(): 4}
+
+        low, high = self.score.get_confidence_interval()
+
+        self.assertAlmostEqual(low, 200 / 3)
+        self.assertAlmostEqual(high, 200 / 3)
+
+    def test_confidence_interval_ignores_stratum_without_competent_mutants(self):
+        for _ in range(8):
+            self.score.add_sample(('AOR',), True)
+        self.score.add_sample(('CRP',), False, competent=False)
+        self.score.add_sample(('CRP',), False, competent=False)
+        self.score.population = {('AOR',): 10, ('CRP',): 10}
+
+        low, high = self.score.get_confidence_interval()
+
+        self.assertGreater(low, 80)
+        self.assertEqual(high, 100)
+
 
 class MockModulesLoader:
 
@@ -58,6 +116,9 @@ class MockModulesLoader:
         self.load()
 
     def load(self, *args, **kwargs):
+        return self.load_module(self.names[0])
+
+    def load_module(self, name):
         exec(self.source, self.module.__dict__)
         sys.modules[self.names[0]] = self.module
         return [(self.module, None)]
@@ -78,6 +139,39 @@ class MutationScoreStoreView:
         self.score = score
 
 
+class MutationNumberStoreView:
+
+    def __init__(self):
+        self.numbers = []
+
+    def mutation(self, number, *args):
+        self.numbers.append(number)
+
+
+class MutantStoreView:
+
+    def __init__(self):
+        self.mutants = []
+
+    def mutation(self, number, mutations, module, mutant):
+        self.mutants.append(views.get_mutant_source(mutant))
+
+
+class MutationStatusStoreView:
+
+    def __init__(self):
+        self.statuses = []
+
+    def killed(self, *args, **kwargs):
+        self.statuses.append('killed')
+
+    def survived(self, *args, **kwargs):
+        self.statuses.append('survived')
+
+    def equivalent(self, *args, **kwargs):
+        self.statuses.append('equivalent')
+
+
 class MutationControllerTest(unittest.TestCase):
     TARGET_SRC = 'def mul(x): return x * x'
     TEST_SRC = utils.f("""
@@ -91,16 +185,20 @@ class MutationControllerTest(unittest.TestCase):
     """)
 
     def setUp(self):
+        self.score_view = MutationScoreStoreView()
+        self.mutation_controller = self.get_mutation_controller()
+
+    def get_mutation_controller(self, **kwargs):
         target_loader = MockModulesLoader('target', self.TARGET_SRC)
         test_loader = MockModulesLoader('test', self.TEST_SRC)
-        self.score_view = MutationScoreStoreView()
         mutator = controller.FirstOrderMutator([operators.ArithmeticOperatorReplacement], percentage=100)
-        self.mutation_controller = MockMutationController(
+        return MockMutationController(
             target_loader=target_loader,
             test_loader=test_loader,
             views=[self.score_view],
             mutant_generator=mutator,
             mutate_covered=True,
+            **kwargs
         )
 
     def test_run(self):
@@ -111,14 +209,522 @@ class MutationControllerTest(unittest.TestCase):
         self.assertEqual(score.killed_mutants, 2)
         self.assertEqual(score.survived_mutants, 1)
 
+    def test_run_parallel(self):
+        mutation_view = MutationNumberStoreView()
+        self.mutation_controller = self.get_mutation_controller(jobs=2)
+        self.mutation_controller.add_view(mutation_view)
+
+        self.mutation_controller.run()
+
+        score = self.score_view.score
+        self.assertEqual(score.all_mutants, 3)
+        self.assertEqual(score.killed_mutants, 2)
+        self.assertEqual(score.survived_mutants, 1)
+        self.assertEqual(mutation_view.numbers, [1, 2, 3])
+
+    def test_register_mutant_phases_times(self):
+        utils.TimeRegister.clean()
+
+        self.mutation_controller.run()
+
+        self.assertIn('create_mutant_module', utils.TimeRegister.executions)
+        self.assertIn('run_tests_with_mutant', utils.TimeRegister.executions)
+
+    def test_add_tests_load_duration_to_worker_live_time(self):
+        self.mutation_controller.load_and_check_tests()
+        tests_load_duration = self.mutation_controller.tests_load_duration
+
+        self.assertGreater(tests_load_duration, 0)
+        self.assertEqual(self.mutation_controller.get_worker_live_time(1),
+                         self.mutation_controller.get_live_time(1) + tests_load_duration)
+
+    def test_store_source_of_pending_mutants(self):
+        mutants_view = MutantStoreView()
+        self.mutation_controller = self.get_mutation_controller(jobs=2)
+        self.mutation_controller.add_view(mutants_view)
+
+        self.mutation_controller.run()
+
+        self.assertEqual(mutants_view.mutants, [
+            'def mul(x):\n    return x / x',
+            'def mul(x):\n    return x // x',
+            'def mul(x):\n    return x ** x',
+        ])
+
+    def test_limit_pending_mutants(self):
+        self.mutation_controller = self.get_mutation_controller(jobs=2)
+        self.mutation_controller.pending_mutants = dict.fromkeys(range(8))
+
+        self.assertFalse(self.mutation_controller.is_pending_full())
+        self.mutation_controller.pending_mutants[8] = None
+        self.assertTrue(self.mutation_controller.is_pending_full())
+
+    def test_cache_key_depends_on_module_and_settings(self):
+        mutation = operators.Mutation(operators.ArithmeticOperatorReplacement, ast.Name(), 'mutate_Mult_to_Div')
+        pending_mutant = controller.PendingMutant(1, [mutation], 'target', None)
+        self.mutation_controller.results_cache = cache.ResultsCache(':memory:')
+        key = self.mutation_controller.get_cache_key(pending_mutant, 'digest')
+
+        other_module_mutant = controller.PendingMutant(1, [mutation], 'other', None)
+        self.assertNotEqual(self.mutation_controller.get_cache_key(other_module_mutant, 'digest'), key)
+        self.mutation_controller.timeout_factor = 10
+        self.assertNotEqual(self.mutation_controller.get_cache_key(pending_mutant, 'digest'), key)
+        self.mutation_controller.timeout_factor = 5
+        self.mutation_controller.coverage_backend = 'trace'
+        self.assertNotEqual(self.mutation_controller.get_cache_key(pending_mutant, 'digest'), key)
+
+    def test_timeout_result_is_not_cached(self):
+        mutation = operators.Mutation(operators.ArithmeticOperatorReplacement, ast.Name(), 'mutate_Mult_to_Div')
+        pending_mutant = controller.PendingMutant(1, [mutation], 'target', None)
+        pending_mutant.cache_key = 'key'
+        pending_mutant.finish(None, 1.0)
+        self.mutation_controller.results_cache = cache.ResultsCache(':memory:')
+        self.mutation_controller.score = controller.MutationScore()
+        self.mutation_controller.pending_mutants[1] = pending_mutant
+
+        self.mutation_controller.notify_finished_mutants()
+
+        self.assertEqual(self.mutation_controller.score.timeout_mutants, 1)
+        self.assertIsNone(self.mutation_controller.results_cache.get('key'))
+
+    def test_failed_work_unit_result_is_not_cached(self):
+        mutation = operators.Mutation(operators.ArithmeticOperatorReplacement, ast.Name(), 'mutate_Mult_to_Div')
+        pending_mutant = controller.PendingMutant(1, [mutation], 'target', None)
+        pending_mutant.cache_key = 'key'
+        pending_mutant.finish(self.mutation_controller.get_incompetent_result(distributed.WorkUnitFailed()), 0)
+        self.mutation_controller.results_cache = cache.ResultsCache(':memory:')
+        self.mutation_controller.score = controller.MutationScore()
+        self.mutation_controller.pending_mutants[1] = pending_mutant
+
+        self.mutation_controller.notify_finished_mutants()
+
+        self.assertEqual(self.mutation_controller.score.incompetent_mutants, 1)
+        self.assertIsNone(self.mutation_controller.results_cache.get('key'))
+
+    def test_dependencies_digests_depend_on_imported_sources(self):
+        tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        self.addCleanup(shutil.rmtree, tmp)
+        module_path = os.path.join(tmp, 'mutpy_cached_dependency.py')
+        with open(module_path, 'w') as module_file:
+            module_file.write('X = 1')
+        sys.path.insert(0, tmp)
+        self.addCleanup(sys.path.remove, tmp)
+        self.addCleanup(sys.modules.pop, 'mutpy_cached_dependency', None)
+        with utils.ModulesDependencyGraph() as self.mutation_controller.modules_graph:
+            import mutpy_cached_dependency  # noqa: F401
+        digests = self.mutation_controller.get_dependencies_digests()
+
+        with open(module_path, 'w') as module_file:
+            module_file.write('X = 2')
+
+        self.assertIn('mutpy_cached_dependency', dict(digests))
+        self.assertNotEqual(self.mutation_controller.get_dependencies_digests(), digests)
+
+    def test_run_with_schemata(self):
+        self.mutation_controller = self.get_mutation_controller(use_schemata=True)
+
+        self.mutation_controller.run()
+
+        score = self.score_view.score
+        self.assertEqual(score.all_mutants, 3)
+        self.assertEqual(score.killed_mutants, 2)
+        self.assertEqual(score.survived_mutants, 1)
+
+    def test_run_with_schemata_and_import_time_mutants(self):
+        self.TARGET_SRC = utils.f("""
+        def make_table():
+            return [i * 2 for i in range(3)]
+        TABLE = make_table()
+        """)
+        self.TEST_SRC = utils.f("""
+        import target
+        from unittest import TestCase
+        class TableTest(TestCase):
+            def test_table(self):
+                self.assertEqual(target.TABLE, [0, 2, 4])
+        """)
+        self.mutation_controller = self.get_mutation_controller(use_schemata=True)
+
+        self.mutation_controller.run()
+
+        score = self.score_view.score
+        self.assertEqual(score.all_mutants, 3)
+        self.assertEqual(score.killed_mutants, 3)
+
+    def test_run_with_schemata_and_mutant_changing_global(self):
+        self.TARGET_SRC = utils.f("""
+        counter = 0
+        def increment(step):
+            global counter
+            counter += step * 1
+            return counter
+        """)
+        self.TEST_SRC = utils.f("""
+        import target
+        from unittest import TestCase
+        class CounterTest(TestCase):
+            def test_increment(self):
+                self.assertEqual(target.increment(2), 2)
+        """)
+        self.mutation_controller = self.get_mutation_controller(use_schemata=True)
+
+        self.mutation_controller.run()
+
+        score = self.score_view.score
+        self.assertGreater(score.all_mutants, 1)
+        self.assertEqual(score.survived_mutants, score.all_mutants)
+
+    def test_run_with_prioritized_tests(self):
+        self.mutation_controller = self.get_mutation_controller(prioritize_tests=True)
+
+        self.mutation_controller.run()
+
+        score = self.score_view.score
+        self.assertEqual(score.all_mutants, 3)
+        self.assertEqual(score.killed_mutants, 2)
+        self.assertEqual(score.survived_mutants, 1)
+
+    def run_worker(self, address, jobs=1):
+        self.get_mutation_controller(jobs=jobs).run_worker(distributed.Worker(address, b'secret'))
+
+    def test_run_work_unit_in_parallel(self):
+        self.mutation_controller = self.get_mutation_controller(jobs=2)
+        self.addCleanup(self.mutation_controller.worker_pool.close)
+        test_modules, total_duration, _ = self.mutation_controller.load_and_check_tests()
+        targets = {target_module.__name__: (target_module, to_mutate) for target_module, to_mutate in
+                   self.mutation_controller.target_loader.load([module for module, *_ in test_modules])}
+
+        results = self.mutation_controller.run_work_unit(targets, total_duration, ('target', 0, 3))
+
+        self.assertEqual([index for index, _, _ in results], [0, 1, 2])
+        self.assertEqual([result.is_survived for _, result, _ in results], [False, False, True])
+        self.assertEqual(len(self.mutation_controller.worker_pool.idle_workers), 2)
+
+    def test_run_with_remote_worker(self):
+        coordinator = distributed.Coordinator(('127.0.0.1', 0), None, b'secret')
+        status_view = MutationStatusStoreView()
+        self.mutation_controller = self.get_mutation_controller(coordinator=coordinator)
+        self.mutation_controller.add_view(status_view)
+        worker_process = multiprocessing.Process(target=self.run_worker, args=(coordinator.address, 2))
+        worker_process.start()
+
+        self.mutation_controller.run()
+        worker_process.join()
+
+        self.assertEqual(status_view.statuses, ['killed', 'killed', 'survived'])
+
+    def test_sample_mutants_to_fit_time_budget(self):
+        self.mutation_controller = self.get_mutation_controller(time_budget=60)
+        self.mutation_controller.deadline = utils.Timer.time_provider() + 60
+        test_modules, _, _ = self.mutation_controller.load_and_check_tests()
+
+        self.mutation_controller.apply_time_budget(test_modules, total_duration=40)
+
+        sampler = self.mutation_controller.mutant_generator.sampler
+        self.assertLess(sampler.percentage, 50)
+        self.assertEqual(sampler.strata, ['operator', 'module'])
+
+    def test_not_sample_mutants_if_time_budget_is_enough(self):
+        self.mutation_controller = self.get_mutation_controller(time_budget=60)
+        self.mutation_controller.deadline = utils.Timer.time_provider() + 60
+        test_modules, _, _ = self.mutation_controller.load_and_check_tests()
+
+        self.mutation_controller.apply_time_budget(test_modules, total_duration=10)
+
+        self.assertFalse(self.mutation_controller.mutant_generator.sampler.is_sampling())
+
+    def test_count_only_covered_candidates_to_fit_time_budget(self):
+        self.TARGET_SRC = utils.f("""
+        def mul(x):
+            return x * x
+        def not_covered(x):
+            return x * x * x
+        """)
+        self.mutation_controller = self.get_mutation_controller(time_budget=60)
+        self.mutation_controller.deadline = utils.Timer.time_provider() + 60
+        test_modules, _, _ = self.mutation_controller.load_and_check_tests()
+
+        self.mutation_controller.apply_time_budget(test_modules, total_duration=10)
+        self.mutation_controller.score = controller.MutationScore()
+        self.mutation_controller.mutate_module(self.mutation_controller.target_loader.module, None, 10)
+        self.mutation_controller.collect_pending_mutants()
+
+        self.assertFalse(self.mutation_controller.mutant_generator.sampler.is_sampling())
+        self.assertEqual(self.mutation_controller.prepared_targets, {})
+        self.assertEqual(self.mutation_controller.score.all_mutants, 3)
+
+    def test_sample_at_least_one_mutant_from_each_stratum_to_fit_time_budget(self):
+        self.assertEqual(self.mutation_controller.get_time_budget_percentage([10, 10], 20), 100)
+        self.assertAlmostEqual(self.mutation_controller.get_time_budget_percentage([100, 100], 20), 10)
+        self.assertLess(self.mutation_controller.get_time_budget_percentage([100, 1, 1], 3), 1)
+
+    def test_limit_live_time_to_deadline(self):
+        self.mutation_controller.deadline = utils.Timer.time_provider() + 60
+
+        self.assertLessEqual(self.mutation_controller.limit_to_deadline(100), 60)
+        self.assertEqual(self.mutation_controller.limit_to_deadline(10), 10)
+
+    def test_cancel_mutant_stopped_by_deadline(self):
+        self.mutation_controller.deadline = utils.Timer.time_provider() - 1
+        pending_mutant = controller.PendingMutant(1, [], 'target', None)
+
+        self.mutation_controller.finish_mutant(pending_mutant, None, 1)
+
+        self.assertTrue(pending_mutant.cancelled)
+        self.assertTrue(self.mutation_controller.time_budget_exceeded)
+
+    def test_stop_if_time_budget_exceeded(self):
+        self.mutation_controller = self.get_mutation_controller(time_budget=1e-9)
+
+        self.mutation_controller.run()
+
+        self.assertEqual(self.score_view.score.all_mutants, 0)
+        self.assertIsNone(self.score_view.score.get_confidence_interval())
+
+    def test_remove_only_modules_depending_on_mutated_module(self):
+        tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        self.addCleanup(shutil.rmtree, tmp)
+        os.makedirs(os.path.join(tmp, 'mutpydep_pkg'))
+        for path, source in [('mutpydep_pkg/__init__.py', ''), ('mutpydep_pkg/target.py', 'X = 1'),
+                             ('mutpydep_heavy.py', 'Y = 1'), ('mutpydep_test.py', 'import mutpydep_heavy\n'
+                                                                                 'from mutpydep_pkg import target')]:
+            with open(os.path.join(tmp, path), 'w') as module_file:
+                module_file.write(source)
+        sys.path.insert(0, tmp)
+        self.addCleanup(sys.path.remove, tmp)
+        self.addCleanup(lambda: [sys.modules.pop(name) for name in list(sys.modules) if name.startswith('mutpydep_')])
+        with utils.ModulesDependencyGraph() as self.mutation_controller.modules_graph:
+            __import__('mutpydep_test')
+
+        self.mutation_controller.remove_loaded_modules('mutpydep_pkg.target')
+
+        self.assertNotIn('mutpydep_test', sys.modules)
+        self.assertNotIn('mutpydep_pkg.target', sys.modules)
+        self.assertIn('mutpydep_heavy', sys.modules)
+        self.assertFalse(hasattr(sys.modules['mutpydep_pkg'], 'target'))
+
+    def create_real_controller(self, modules):
+        tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        self.addCleanup(shutil.rmtree, tmp)
+        for path, source in modules.items():
+            with open(os.path.join(tmp, path), 'w') as module_file:
+                module_file.write(source)
+        self.addCleanup(lambda: [sys.modules.pop(name) for name in list(sys.modules) if name.startswith('mutpykeep_')])
+        mutation_controller = controller.MutationController(
+            target_loader=utils.ModulesLoader(['mutpykeep_target'], tmp),
+            test_loader=utils.ModulesLoader(['mutpykeep_test'], tmp),
+            views=[],
+            mutant_generator=controller.FirstOrderMutator([operators.ArithmeticOperatorReplacement]),
+        )
+        self.addCleanup(lambda: [sys.path.remove(tmp) for _ in range(sys.path.count(tmp))])
+        mutation_controller.load_and_check_tests()
+        return mutation_controller
+
+    def test_keep_test_module_and_patch_references_to_mutant(self):
+        mutation_controller = self.create_real_controller({
+            'mutpykeep_counter.py': 'loads = 0',
+            'mutpykeep_target.py': 'def mul(x):\n    return x * x',
+            'mutpykeep_test.py': utils.f("""
+            import unittest
+            import mutpykeep_counter
+            from mutpykeep_target import mul
+            mutpykeep_counter.loads += 1
+            class MulTest(unittest.TestCase):
+                def test_mul(self):
+                    self.assertEqual(mul(3), 9)
+            """),
+        })
+        target_module = sys.modules['mutpykeep_target']
+        test_module = sys.modules['mutpykeep_test']
+        mutant_module = utils.create_module(utils.create_ast('def mul(x):\n    return x + x'), 'mutpykeep_target')
+
+        result, _ = mutation_controller.run_tests_with_mutant(mutant_module)
+
+        self.assertFalse(result.is_survived)
+        self.assertEqual(sys.modules['mutpykeep_counter'].loads, 1)
+        self.assertIs(sys.modules['mutpykeep_test'], test_module)
+        self.assertIs(sys.modules['mutpykeep_target'], target_module)
+        self.assertIs(test_module.mul, target_module.mul)
+
+    def test_reload_test_module_derived_from_mutated_class(self):
+        mutation_controller = self.create_real_controller({
+            'mutpykeep_counter.py': 'loads = 0',
+            'mutpykeep_target.py': 'class Base:\n    def value(self):\n        return 2 * 3',
+            'mutpykeep_test.py': utils.f("""
+            import unittest
+            import mutpykeep_counter
+            from mutpykeep_target import Base
+            mutpykeep_counter.loads += 1
+            class Derived(Base):
+                pass
+            class DerivedTest(unittest.TestCase):
+                def test_value(self):
+                    self.assertEqual(Derived().value(), 6)
+            """),
+        })
+        mutant_module = utils.create_module(
+            utils.create_ast('class Base:\n    def value(self):\n        return 2 + 3'),
+            'mutpykeep_target',
+        )
+
+        result, _ = mutation_controller.run_tests_with_mutant(mutant_module)
+
+        self.assertFalse(result.is_survived)
+        self.assertEqual(sys.modules['mutpykeep_counter'].loads, 2)
+
+    def test_resume_from_journal(self):
+        tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, 'journal.jsonl')
+        self.mutation_controller.add_view(views.JournalView(journal.MutationJournal(path)))
+        self.mutation_controller.run()
+        with open(path) as journal_file:
+            entries = [json.loads(line) for line in journal_file]
+        self.assertEqual([entry['status'] for entry in entries], ['killed', 'killed', 'survived'])
+        with open(path, 'w') as journal_file:
+            for entry in entries[:2]:
+                entry['status'] = 'survived'
+                journal_file.write(json.dumps(entry) + '\n')
+        self.mutation_controller = self.get_mutation_controller(journal=journal.MutationJournal(path))
+
+        self.mutation_controller.run()
+
+        score = self.score_view.score
+        self.assertEqual(score.all_mutants, 3)
+        self.assertEqual(score.killed_mutants, 0)
+        self.assertEqual(score.survived_mutants, 3)
+
+    def test_live_time_of_covering_tests(self):
+        self.mutation_controller.test_durations = {'test.A.test_a': 2, 'test.A.test_b': 3, 'test.A.test_c': 0.1}
+
+        self.assertEqual(self.mutation_controller.get_live_time(20, ['test.A.test_a', 'test.A.test_b']), 25)
+        self.assertEqual(self.mutation_controller.get_live_time(20, ['test.A.test_c']), 5)
+        self.assertEqual(self.mutation_controller.get_live_time(20, ['test.A.test_d']), 100)
+        self.assertEqual(self.mutation_controller.get_live_time(20), 100)
+
+    def test_load_only_covering_tests(self):
+        self.mutation_controller.load_and_check_tests()
+        self.mutation_controller.test_loader.load = unittest.mock.Mock(side_effect=AssertionError)
+
+        suite = self.mutation_controller.load_test_suite(covering_tests=['test.MulTest.test_mul'])
+
+        self.assertEqual([test.id() for test in suite], ['test.MulTest.test_mul'])
+
+    def test_skip_not_covering_tests_if_test_not_found(self):
+        suite = self.mutation_controller.load_test_suite(covering_tests=['test.MulTest.test_mul', 'test.Other.test'])
+        result = unittest.TestResult()
+
+        suite.run(result)
+
+        self.assertEqual(result.testsRun, 2)
+        self.assertEqual(len(result.skipped), 1)
+
+
+class TestsPrioritizerTest(unittest.TestCase):
+
+    class ATest(unittest.TestCase):
+
+        def test_a(self):
+            pass
+
+        def test_b(self):
+            pass
+
+        def test_c(self):
+            pass
+
+    class BTest(unittest.TestCase):
+
+        def test_d(self):
+            pass
+
+    def setUp(self):
+        self.tests = {name: self.ATest(methodName=name) for name in ['test_a', 'test_b', 'test_c']}
+        self.prioritizer = controller.TestsPrioritizer(
+            durations={self.tests['test_a'].id(): 3, self.tests['test_b'].id(): 2, self.tests['test_c'].id(): 1},
+            test_ids={str(test): test.id() for test in self.tests.values()},
+        )
+        self.suite = unittest.TestSuite([unittest.TestSuite([self.tests['test_a'], self.tests['test_b']]),
+                                         self.tests['test_c']])
+
+    def get_order(self, mutations):
+        prioritized_tests = self.prioritizer.get_prioritized_tests('target', mutations)
+        return [test._testMethodName for test in self.prioritizer.sort(self.suite, prioritized_tests)]
+
+    def test_fastest_tests_first(self):
+        self.assertEqual(self.get_order([]), ['test_c', 'test_b', 'test_a'])
+
+    def test_killers_first(self):
+        node = ast.Sub(index=1, end_index=2)
+        self.prioritizer.add_killer('target', [operators.Mutation(operators.ConstantReplacement, node)],
+                                    str(self.tests['test_b']))
+        self.prioritizer.add_killer('target', [operators.Mutation(operators.ArithmeticOperatorReplacement, node)],
+                                    str(self.tests['test_a']))
+
+        same_node_mutation = operators.Mutation(operators.ConstantReplacement, node)
+        same_operator_mutation = operators.Mutation(operators.ConstantReplacement, ast.Sub(index=3, end_index=4))
+
+        self.assertEqual(self.get_order([same_node_mutation]), ['test_a', 'test_b', 'test_c'])
+        self.assertEqual(self.get_order([same_operator_mutation]), ['test_b', 'test_c', 'test_a'])
+
+    def test_keep_tests_of_class_together(self):
+        test_d = self.BTest(methodName='test_d')
+        self.suite.addTest(test_d)
+        self.prioritizer.durations[test_d.id()] = 2
+        self.prioritizer.add_killer('target', [operators.Mutation(operators.ConstantReplacement, ast.Sub())],
+                                    str(self.tests['test_a']))
+
+        self.assertEqual(self.get_order([operators.Mutation(operators.ConstantReplacement, ast.Sub())]),
+                         ['test_a', 'test_c', 'test_b', 'test_d'])
+        self.assertEqual(self.get_order([]), ['test_c', 'test_b', 'test_a', 'test_d'])
+
+
+class SkipEquivalentMutantsTest(unittest.TestCase):
+    TARGET_SRC = utils.f("""
+    def f(x):
+        if False:
+            return x + 1
+        return -(-x)
+    """)
+    TEST_SRC = utils.f("""
+    import target
+    from unittest import TestCase
+    class FTest(TestCase):
+        def test_f(self):
+            self.assertEqual(target.f(2), 2)
+    """)
+
+    def test_run(self):
+        score_view = MutationScoreStoreView()
+        status_view = MutationStatusStoreView()
+        mutator = controller.FirstOrderMutator([
+            operators.ArithmeticOperatorDeletion,
+            operators.ArithmeticOperatorReplacement,
+        ])
+        mutation_controller = MockMutationController(
+            target_loader=MockModulesLoader('target', self.TARGET_SRC),
+            test_loader=MockModulesLoader('test', self.TEST_SRC),
+            views=[score_view, status_view],
+            mutant_generator=mutator,
+            skip_equivalent=True,
+        )
+
+        mutation_controller.run()
+
+        score = score_view.score
+        self.assertEqual(score.all_mutants, 4)
+        self.assertEqual(score.killed_mutants, 4)
+        self.assertEqual(score.equivalent_mutants, 1)
+        self.assertEqual(status_view.statuses, ['killed', 'killed', 'equivalent', 'killed', 'killed'])
+
 
 class FirstToLastHOMStrategyTest(unittest.TestCase):
 
     def test_generate(self):
         mutations = [
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=0, end_index=1)),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=1, end_index=2)),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=2, end_index=3)),
         ]
         hom_strategy = controller.FirstToLastHOMStrategy(order=2)
 
@@ -148,9 +754,10 @@ class FirstToLastHOMStrategyTest(unittest.TestCase):
         self.assertEqual(changes_to_apply[1][0], mutations[1])
 
     def test_generate_if_node_child(self):
-        node = ast.Sub(children=[])
+        node = ast.Sub(index=1, end_index=2)
         mutations = [
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.UnaryOp(children=[node])),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement,
+                               node=ast.UnaryOp(index=0, end_index=2)),
             operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=node),
         ]
         hom_strategy = controller.FirstToLastHOMStrategy(order=2)
@@ -168,9 +775,9 @@ class EachChoiceHOMStrategyTest(unittest.TestCase):
 
     def test_generate(self):
         mutations = [
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=0, end_index=1)),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=1, end_index=2)),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=2, end_index=3)),
         ]
         hom_strategy = controller.EachChoiceHOMStrategy(order=2)
 
@@ -188,8 +795,8 @@ class BetweenOperatorsHOMStrategyTest(unittest.TestCase):
 
     def test_generate_if_one_operator(self):
         mutations = [
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=0, end_index=1)),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=1, end_index=2)),
         ]
         hom_strategy = controller.BetweenOperatorsHOMStrategy(order=2)
 
@@ -203,9 +810,9 @@ class BetweenOperatorsHOMStrategyTest(unittest.TestCase):
 
     def test_generate_if_two_operators(self):
         mutations = [
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.AssignmentOperatorReplacement, node=ast.Sub(children=[])),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=0, end_index=1)),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=1, end_index=2)),
+            operators.Mutation(operator=operators.AssignmentOperatorReplacement, node=ast.Sub(index=2, end_index=3)),
         ]
         hom_strategy = controller.BetweenOperatorsHOMStrategy(order=2)
 
@@ -221,10 +828,10 @@ class BetweenOperatorsHOMStrategyTest(unittest.TestCase):
 
     def test_generate_if_three_operators(self):
         mutations = [
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.AssignmentOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ConstantReplacement, node=ast.Sub(children=[])),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=0, end_index=1)),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=1, end_index=2)),
+            operators.Mutation(operator=operators.AssignmentOperatorReplacement, node=ast.Sub(index=2, end_index=3)),
+            operators.Mutation(operator=operators.ConstantReplacement, node=ast.Sub(index=3, end_index=4)),
         ]
         hom_strategy = controller.BetweenOperatorsHOMStrategy(order=2)
 
@@ -243,9 +850,9 @@ class RandomHOMStrategyTest(unittest.TestCase):
 
     def test_generate(self):
         mutations = [
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
-            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(children=[])),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=0, end_index=1)),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=1, end_index=2)),
+            operators.Mutation(operator=operators.ArithmeticOperatorReplacement, node=ast.Sub(index=2, end_index=3)),
         ]
 
         def shuffler(mutations):
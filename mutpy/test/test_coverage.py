@@ -195,6 +195,53 @@ class CoverageInjectorTest(unittest.TestCase):
         self.assertTrue(self.coverage_injector.is_covered(else_body_el))
 
 
+class TracingCoverageInjectorTest(CoverageInjectorTest):
+
+    def setUp(self):
+        self.coverage_injector = coverage.TracingCoverageInjector()
+
+    def test_function_call_coverage(self):
+        node = utils.create_ast(utils.f("""
+        def f():
+            global x
+            x = 1
+        def g():
+            \"\"\"doc\"\"\"
+        g()
+        """))
+
+        self.coverage_injector.inject(node)
+
+        f_node, g_node = node.body[:2]
+        self.assertFalse(self.coverage_injector.is_covered(f_node.body[0]))
+        self.assertFalse(self.coverage_injector.is_covered(f_node.body[1]))
+        self.assertTrue(self.coverage_injector.is_covered(g_node.body[0]))
+
+
+class CoverageMatrixTest(unittest.TestCase):
+
+    def setUp(self):
+        self.coverage_matrix = coverage.CoverageMatrix(always_covered_nodes={0})
+        for index in range(20):
+            self.coverage_matrix.add_test('test_{}'.format(index), {0, index % 3 + 1})
+
+    def test_not_covered_tests(self):
+        not_covered_tests = self.coverage_matrix.get_not_covered_tests({1, 2})
+
+        self.assertEqual(not_covered_tests, ['test_{}'.format(index) for index in range(2, 20, 3)])
+
+    def test_covering_tests(self):
+        covering_tests = self.coverage_matrix.get_covering_test_names({3})
+
+        self.assertEqual(covering_tests, ['test_{}'.format(index) for index in range(2, 20, 3)])
+
+    def test_always_covered_node(self):
+        self.assertEqual(len(self.coverage_matrix.get_covering_test_names({0, 4})), 20)
+
+    def test_not_covered_node(self):
+        self.assertEqual(len(self.coverage_matrix.get_not_covered_tests({4})), 20)
+
+
 class CoverageTestResultTest(unittest.TestCase):
 
     def test_run(self):
@@ -224,5 +271,33 @@ class CoverageTestResultTest(unittest.TestCase):
         suite.run(result)
 
         self.assertEqual(coverage_injector.covered_nodes, {1})
-        self.assertEqual(result.test_covered_nodes[repr(test_x)], {1})
-        self.assertFalse(result.test_covered_nodes[repr(test_y)])
+        self.assertEqual(result.coverage_matrix.get_not_covered_tests({1}), [test_y.id()])
+        self.assertEqual(result.coverage_matrix.get_covering_test_names({2}), [])
+
+    def test_run_with_tracing(self):
+        coverage_injector = coverage.TracingCoverageInjector()
+        node = utils.create_ast(utils.f("""
+        def x():
+            return 1
+        """))
+        module = coverage_injector.inject(node)
+
+        class ATest(unittest.TestCase):
+
+            def test_x(self):
+                module.x()
+
+            def test_y(self):
+                pass
+
+        result = coverage.CoverageTestResult(coverage_injector=coverage_injector)
+        suite = unittest.TestSuite()
+        test_x = ATest(methodName='test_x')
+        suite.addTest(test_x)
+        test_y = ATest(methodName='test_y')
+        suite.addTest(test_y)
+
+        suite.run(result)
+
+        return_marker = node.body[0].body[0].marker
+        self.assertEqual(result.coverage_matrix.get_covering_test_names({return_marker}), [test_x.id()])
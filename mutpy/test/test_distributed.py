@@ -0,0 +1,128 @@
+import multiprocessing
+import threading
+import unittest
+from mutpy import distributed
+
+
+class ParseAddressTest(unittest.TestCase):
+
+    def test_parse_address(self):
+        self.assertEqual(distributed.parse_address('example.com:8000'), ('example.com', 8000))
+        self.assertEqual(distributed.parse_address(':8000'), ('localhost', 8000))
+
+
+class CoordinatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.coordinator = distributed.Coordinator(('127.0.0.1', 0), 'config', b'secret', unit_size=2)
+        self.units = []
+
+    def tearDown(self):
+        self.coordinator.close()
+
+    def start_worker(self):
+        def run():
+            worker = distributed.Worker(self.coordinator.address, b'secret')
+            self.assertEqual(worker.config, 'config')
+            self.assertEqual(worker.seed, self.coordinator.seed)
+            worker.serve(self.handle_unit)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def handle_unit(self, unit):
+        self.units.append(unit)
+        module_name, start, stop = unit
+        return [(index, '{}-{}'.format(module_name, index), 0.1) for index in range(start, stop)]
+
+    def test_run_work_units(self):
+        self.start_worker()
+        tasks = [('a', 0), ('a', 1), ('a', 2), ('a', 4), ('b', 0)]
+        for key, task in enumerate(tasks):
+            self.coordinator.start(key, task)
+
+        results = []
+        while len(results) < len(tasks):
+            results += self.coordinator.wait_for_results()
+
+        self.assertEqual(sorted(results), [(0, 'a-0', 0.1), (1, 'a-1', 0.1), (2, 'a-2', 0.1), (3, 'a-4', 0.1),
+                                           (4, 'b-0', 0.1)])
+        self.assertEqual(sorted(self.units), [('a', 0, 2), ('a', 2, 3), ('a', 4, 5), ('b', 0, 1)])
+        self.assertEqual(self.coordinator.wait_for_results(), [])
+
+    def test_is_full_without_workers(self):
+        self.coordinator.start(0, ('a', 0))
+        self.assertFalse(self.coordinator.is_full())
+
+        self.coordinator.start(1, ('b', 0))
+
+        self.assertTrue(self.coordinator.is_full())
+
+    def test_reject_worker_with_wrong_key(self):
+        with self.assertRaises(multiprocessing.AuthenticationError):
+            distributed.Worker(self.coordinator.address, b'wrong')
+
+        self.start_worker()
+        self.coordinator.start(0, ('a', 0))
+        results = []
+        while not results:
+            results = self.coordinator.wait_for_results()
+
+        self.assertEqual(results, [(0, 'a-0', 0.1)])
+
+    def start_hung_worker(self):
+        def run():
+            worker = distributed.Worker(self.coordinator.address, b'secret')
+            try:
+                worker.connection.recv()
+                worker.connection.recv()
+            except (OSError, EOFError):
+                pass
+            finally:
+                worker.connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def test_resend_unit_of_hung_worker(self):
+        self.coordinator.unit_timeout = 0.1
+        self.start_hung_worker()
+        self.coordinator.start(0, ('a', 0))
+        while not self.coordinator.busy_workers:
+            self.coordinator.wait_for_results()
+        self.start_worker()
+
+        results = []
+        while not results:
+            results = self.coordinator.wait_for_results()
+
+        self.assertEqual(results, [(0, 'a-0', 0.1)])
+        self.assertEqual(self.units, [('a', 0, 1)])
+
+    def start_dropping_worker(self, connections_number):
+        def run():
+            for _ in range(connections_number):
+                worker = distributed.Worker(self.coordinator.address, b'secret')
+                worker.connection.recv()
+                worker.connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def test_report_unit_as_incompetent_after_max_retries(self):
+        self.start_dropping_worker(distributed.Coordinator.MAX_UNIT_RETRIES + 1)
+        self.coordinator.start(0, ('a', 0))
+        self.coordinator.start(1, ('a', 1))
+
+        results = []
+        while not results:
+            results = self.coordinator.wait_for_results()
+
+        self.assertEqual([key for key, _, _ in results], [0, 1])
+        for _, result, _ in results:
+            self.assertTrue(result.is_incompetent)
+            self.assertIsInstance(result.exception, distributed.WorkUnitFailed)
+        self.assertEqual(self.coordinator.wait_for_results(), [])
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from mutpy import journal
+
+
+class MockOperator:
+
+    @classmethod
+    def name(cls):
+        return 'AOR'
+
+
+class MockNode:
+    index = 3
+
+
+class MockMutation:
+    operator = MockOperator
+    visitor = 'mutate_Add'
+    node = MockNode()
+
+
+class MutationJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        self.path = os.path.join(self.tmp, 'journal.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def get_entry(self, status='killed'):
+        return {
+            'number': 1,
+            'module': 'target',
+            'mutations': [{'operator': 'AOR', 'lineno': 1, 'visitor': 'mutate_Add', 'node': 3}],
+            'status': status,
+        }
+
+    def test_get_missing(self):
+        mutation_journal = journal.MutationJournal(self.path)
+
+        self.assertIsNone(mutation_journal.get('target', [MockMutation()]))
+
+    def test_append_and_get_after_reopen(self):
+        mutation_journal = journal.MutationJournal(self.path)
+        mutation_journal.append(self.get_entry())
+        mutation_journal.close()
+
+        mutation_journal = journal.MutationJournal(self.path)
+
+        self.assertEqual(mutation_journal.get('target', [MockMutation()])['status'], 'killed')
+        self.assertIsNone(mutation_journal.get('other', [MockMutation()]))
+
+    def test_skip_already_recorded(self):
+        mutation_journal = journal.MutationJournal(self.path)
+        mutation_journal.append(self.get_entry())
+        mutation_journal.append(self.get_entry('survived'))
+        mutation_journal.close()
+
+        with open(self.path) as journal_file:
+            self.assertEqual(len(journal_file.readlines()), 1)
+
+    def test_skip_truncated_line(self):
+        with open(self.path, 'w') as journal_file:
+            journal_file.write('{"number": 1, "mod')
+        mutation_journal = journal.MutationJournal(self.path)
+        mutation_journal.append(self.get_entry())
+        mutation_journal.close()
+
+        mutation_journal = journal.MutationJournal(self.path)
+
+        self.assertEqual(len(mutation_journal.entries), 1)
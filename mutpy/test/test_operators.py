@@ -23,7 +23,7 @@ class MutationOperatorTest(unittest.TestCase):
 
         class AlwaysSampler:
 
-            def is_mutation_time(self):
+            def is_mutation_time(self, *args):
                 return True
 
         mutations = list(self.operator.mutate(self.target_ast, sampler=AlwaysSampler()))
@@ -34,7 +34,7 @@ class MutationOperatorTest(unittest.TestCase):
 
         class NeverSampler:
 
-            def is_mutation_time(self):
+            def is_mutation_time(self, *args):
                 return False
 
         mutations = list(self.operator.mutate(self.target_ast, sampler=NeverSampler()))
@@ -42,6 +42,60 @@ class MutationOperatorTest(unittest.TestCase):
         self.assertEqual(len(mutations), 0)
 
 
+    def test_visitors_table(self):
+        table = operators.ArithmeticOperatorReplacement.get_visitors_table()
+
+        self.assertEqual(table['Mult'], ['mutate_Mult_to_Div', 'mutate_Mult_to_FloorDiv', 'mutate_Mult_to_Pow'])
+        self.assertNotIn('BinOp', table)
+        self.assertIsNot(table, operators.ConstantReplacement.get_visitors_table())
+
+    def test_undo_in_place_mutation(self):
+        target_ast = utils.create_ast(utils.f("""
+        @notmutate_me
+        def f():
+            pass
+        """))
+        function = target_ast.body[0]
+        decorators = function.decorator_list
+
+        for mutation, mutant in operators.DecoratorDeletion().mutate(target_ast):
+            self.assertIs(mutant.body[0], function)
+            self.assertEqual(function.decorator_list, [])
+
+        self.assertIs(function.decorator_list, decorators)
+        self.assertEqual(len(decorators), 1)
+
+    def test_mutate_only_selected_lines(self):
+        target_ast = utils.create_ast('x = a + b\ny = a + b')
+
+        mutations = list(operators.ArithmeticOperatorReplacement().mutate(target_ast, lines={2}))
+
+        self.assertEqual(len(mutations), 1)
+        self.assertEqual(mutations[0][0].node.lineno, 2)
+
+
+class MutationTraversalTest(unittest.TestCase):
+
+    def test_same_mutants_as_separate_operators(self):
+        source = utils.f("""
+        def f(x, y):
+            if x < y[1:2]:
+                return -x * 2
+            return 'mutpy' + y
+        """)
+        target_ast = utils.create_ast(source)
+        operators_list = utils.sort_operators(operators.standard_operators)
+
+        expected = [(mutation.operator, mutation.visitor, codegen.to_source(mutant))
+                    for operator in operators_list for mutation, mutant in operator().mutate(target_ast)]
+        traversal = operators.MutationTraversal(operators_list)
+        mutants = [(mutation.operator, mutation.visitor, codegen.to_source(mutant))
+                   for mutation, mutant in traversal.mutate(target_ast)]
+
+        self.assertEqual(mutants, expected)
+        self.assertEqual(codegen.to_source(target_ast), codegen.to_source(utils.create_ast(source)))
+
+
 class OperatorTestCase(unittest.TestCase):
 
     def assert_mutation(self, original, mutants, lines=None, operator=None, with_coverage=False, with_exec=False):
@@ -0,0 +1,115 @@
+import unittest
+from mutpy import schemata, controller, operators, utils
+
+
+class MutantSchemaTest(unittest.TestCase):
+
+    def create_schema(self, source, operators_list):
+        target_ast = utils.create_ast(source)
+        schema = schemata.MutantSchema(target_ast)
+        mutator = controller.FirstOrderMutator(operators_list)
+        mutant_ids = [schema.add_mutant(mutations) for mutations, _ in mutator.mutate(target_ast)]
+        return schema, mutant_ids
+
+    def test_switch_mutants(self):
+        schema, mutant_ids = self.create_schema(utils.f("""
+        def f(x, y):
+            return x + y
+        """), [operators.ArithmeticOperatorReplacement, operators.StatementDeletion])
+        module = schemata.create_schema_module(schema.compile('schema'), 'schema')
+
+        self.assertEqual(mutant_ids, [1, 2])
+        self.assertEqual(module.f(2, 1), 3)
+        schemata.activate_mutant(module, 1)
+        self.assertEqual(module.f(2, 1), 1)
+        schemata.activate_mutant(module, 2)
+        self.assertIsNone(module.f(2, 1))
+
+    def test_skip_module_level_mutation(self):
+        schema, mutant_ids = self.create_schema(utils.f("""
+        x = 1 + 2
+        def f():
+            return x - 1
+        """), [operators.ArithmeticOperatorReplacement])
+
+        self.assertEqual(mutant_ids, [None, 1])
+
+    def test_record_switches_executed_at_import(self):
+        schema, mutant_ids = self.create_schema(utils.f("""
+        def make_table():
+            return [i * 2 for i in range(3)]
+        def f(x):
+            return x * 2
+        TABLE = make_table()
+        """), [operators.ArithmeticOperatorReplacement])
+        switch_recorder = schemata.SwitchRecorder()
+
+        schemata.create_schema_module(schema.compile('schema'), 'schema', switch_recorder)
+
+        self.assertEqual(mutant_ids, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(switch_recorder.mutant_ids, {1, 2, 3})
+
+    def test_remove_mutants(self):
+        target_ast = utils.create_ast('def f(x):\n    return -x')
+        schema = schemata.MutantSchema(target_ast)
+        mutator = controller.FirstOrderMutator([operators.ArithmeticOperatorDeletion])
+        for mutations, _ in mutator.mutate(target_ast):
+            schema.add_mutant(mutations)
+
+        schema.remove_mutants({1})
+
+        for mutations, _ in mutator.mutate(target_ast):
+            self.assertIsNone(schema.get_mutant_id(mutations))
+
+    def test_get_mutant_id(self):
+        target_ast = utils.create_ast('def f(x):\n    return -x')
+        schema = schemata.MutantSchema(target_ast)
+        mutator = controller.FirstOrderMutator([operators.ArithmeticOperatorDeletion])
+        for mutations, _ in mutator.mutate(target_ast):
+            schema.add_mutant(mutations)
+
+        for mutations, _ in mutator.mutate(target_ast):
+            self.assertEqual(schema.get_mutant_id(mutations), 1)
+
+
+class ModulesStateTest(unittest.TestCase):
+
+    def create_module(self):
+        return utils.create_module(utils.create_ast(utils.f("""
+        counter = 0
+        calls = []
+        class A:
+            x = 1
+        """)), module_name='state')
+
+    def test_not_changed(self):
+        module = self.create_module()
+        state = schemata.ModulesState([module])
+
+        module.calls[:] = []
+
+        self.assertFalse(state.is_changed())
+
+    def test_changed_global(self):
+        module = self.create_module()
+        state = schemata.ModulesState([module])
+
+        module.counter += 1
+
+        self.assertTrue(state.is_changed())
+
+    def test_changed_container(self):
+        module = self.create_module()
+        state = schemata.ModulesState([module])
+
+        module.calls.append(1)
+
+        self.assertTrue(state.is_changed())
+
+    def test_changed_class_attribute(self):
+        module = self.create_module()
+        state = schemata.ModulesState([module])
+
+        module.A.y = 2
+
+        self.assertTrue(state.is_changed())
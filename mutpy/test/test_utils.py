@@ -1,8 +1,12 @@
+import ast
+import importlib
 import unittest
+import unittest.mock
 import os
 import shutil
 import types
 import tempfile
+import time
 import sys
 from mutpy import utils, operators
 
@@ -73,6 +77,42 @@ class ModulesLoaderTest(unittest.TestCase):
         self.assert_module(target[0], 'a.b.c.sample', 'a/b/c/sample.py', [])
         self.assert_module(test[0], 'a.b.c.sample_test', 'a/b/c/sample_test.py', [])
 
+    def test_load_resolves_once(self):
+        self.loader.names = ['a']
+        self.loader.load_single = unittest.mock.Mock(wraps=self.loader.load_single)
+
+        first = list(self.loader.load())
+        second = list(self.loader.load())
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.loader.load_single.call_count, 1)
+
+    def test_load_resolves_again_after_file_modification(self):
+        self.loader.names = ['a.b.c.sample.X']
+        self.loader.load_single = unittest.mock.Mock(wraps=self.loader.load_single)
+        list(self.loader.load())
+        module_file = ModulesLoaderTest.tmp + 'a/b/c/sample.py'
+        mtime = os.stat(module_file).st_mtime_ns
+        os.utime(module_file, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+        [(module, to_mutate)] = self.loader.load()
+
+        self.assertEqual(self.loader.load_single.call_count, 2)
+        self.assertEqual(to_mutate, 'X')
+
+    def test_load_resolves_again_after_cached_import_error(self):
+        self.loader.names = ['a.b.c.sample']
+        self.loader.load_single = unittest.mock.Mock(wraps=self.loader.load_single)
+        list(self.loader.load())
+        _, mtimes = self.loader.resolved['a.b.c.sample']
+        self.loader.resolved['a.b.c.sample'] = ([('a.b.c.missing', None)], mtimes)
+
+        [(module, to_mutate)] = self.loader.load()
+
+        self.assertEqual(self.loader.load_single.call_count, 2)
+        self.assert_module(module, 'a.b.c.sample', 'a/b/c/sample.py', ['X'])
+        self.assertEqual(self.loader.resolved['a.b.c.sample'][0], [('a.b.c.sample', None)])
+
 
 class MockTimer():
 
@@ -172,6 +212,185 @@ class TestF(unittest.TestCase):
         """), 'def f():\n    pass')
 
 
+class GetCodeDigestTest(unittest.TestCase):
+
+    def get_code_digest(self, source):
+        return utils.get_code_digest(compile(source, 'test', 'exec'))
+
+    def test_same_code(self):
+        self.assertEqual(self.get_code_digest('x = y + 1'), self.get_code_digest('x = y + 1'))
+
+    def test_different_code(self):
+        self.assertNotEqual(self.get_code_digest('x = y + 1'), self.get_code_digest('x = y - 1'))
+
+    def test_different_constant_type(self):
+        self.assertNotEqual(self.get_code_digest('x = 1'), self.get_code_digest('x = 1.0'))
+
+    def test_nested_code(self):
+        self.assertNotEqual(
+            self.get_code_digest('def f(y):\n    return y + 1'),
+            self.get_code_digest('def f(y):\n    return y - 1'),
+        )
+
+    def test_ignore_line_numbers(self):
+        self.assertEqual(self.get_code_digest('x = 1'), self.get_code_digest('\nx = 1'))
+
+
+class ParseDiffTest(unittest.TestCase):
+
+    def test_parse_diff(self):
+        diff = utils.f("""
+        diff --git a/a/b.py b/a/b.py
+        --- a/a/b.py
+        +++ b/a/b.py
+        @@ -1 +1 @@
+        -x = 1
+        +x = 2
+        @@ -10,0 +11,2 @@ def f():
+        +    y = 1
+        +    z = 2
+        @@ -20,3 +22,0 @@
+        -    a = 1
+        -    b = 2
+        -    c = 3
+        diff --git a/c.py b/c.py
+        deleted file mode 100644
+        --- a/c.py
+        +++ /dev/null
+        @@ -1 +0,0 @@
+        -x = 1
+        """)
+
+        changed_lines = utils.parse_diff(diff, '/root')
+
+        self.assertEqual(changed_lines, {'/root/a/b.py': {1, 11, 12, 22}})
+
+    def test_parse_diff_with_added_line_like_file_header(self):
+        diff = utils.f("""
+        diff --git a/a.py b/a.py
+        --- a/a.py
+        +++ b/a.py
+        @@ -1,2 +1,3 @@
+         x = 1
+        +++ b/other.py
+        -y = 2
+        +y = 3
+        @@ -9 +10 @@
+        -z = 1
+        +z = 2
+        """)
+
+        changed_lines = utils.parse_diff(diff, '/root')
+
+        self.assertEqual(changed_lines, {'/root/a.py': {1, 2, 3, 10}})
+
+    def test_parse_diff_resolves_symlinked_root(self):
+        tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        link = tmp + '-link'
+        os.symlink(tmp, link)
+        self.addCleanup(shutil.rmtree, tmp)
+        self.addCleanup(os.remove, link)
+        diff = utils.f("""
+        --- a/a.py
+        +++ b/a.py
+        @@ -1 +1 @@
+        -x = 1
+        +x = 2
+        """)
+
+        changed_lines = utils.parse_diff(diff, link)
+
+        self.assertEqual(changed_lines, {os.path.join(os.path.realpath(tmp), 'a.py'): {1}})
+
+
+class ReferencesPatcherTest(unittest.TestCase):
+
+    @staticmethod
+    def create_module(name, source):
+        module = types.ModuleType(name)
+        exec(source, module.__dict__)
+        return module
+
+    def test_patch_and_restore(self):
+        old_module = self.create_module('target', 'def f(): pass\nLIMIT = 10\nOTHER = 10')
+        new_module = self.create_module('target', 'def f(): pass\nLIMIT = 11\nOTHER = 10')
+        kept_module = self.create_module('kept', '')
+        kept_module.target = old_module
+        kept_module.f = old_module.f
+        kept_module.LIMIT = old_module.LIMIT
+        kept_module.TEN = 10
+        patcher = utils.ReferencesPatcher()
+        patcher.add_module(old_module, new_module)
+
+        patcher.patch(kept_module)
+
+        self.assertIs(kept_module.target, new_module)
+        self.assertIs(kept_module.f, new_module.f)
+        self.assertEqual(kept_module.LIMIT, 11)
+        self.assertEqual(kept_module.TEN, 10)
+        patcher.restore()
+        self.assertIs(kept_module.target, old_module)
+        self.assertIs(kept_module.f, old_module.f)
+        self.assertEqual(kept_module.LIMIT, 10)
+
+    def test_not_patchable_if_built_from_replaced_objects(self):
+        replaced_module = self.create_module('target', 'class A: pass\ndef f(): pass')
+        kept_module = self.create_module('kept', '')
+        kept_module.A = replaced_module.A
+        kept_module.f = replaced_module.f
+        self.assertTrue(utils.ReferencesPatcher.is_patchable(kept_module, [replaced_module]))
+
+        kept_module.FUNCTIONS = [replaced_module.f]
+
+        self.assertFalse(utils.ReferencesPatcher.is_patchable(kept_module, [replaced_module]))
+
+
+class ModulesDependencyGraphTest(unittest.TestCase):
+
+    MODULES = {
+        'mutpydep_pkg/__init__.py': '',
+        'mutpydep_pkg/target.py': 'X = 1',
+        'mutpydep_heavy.py': 'Y = 1',
+        'mutpydep_user.py': 'from mutpydep_pkg import target',
+        'mutpydep_test.py': 'import mutpydep_heavy\nimport mutpydep_user',
+        'mutpydep_dynamic.py': 'import importlib\nTARGET = importlib.import_module("mutpydep_pkg.target")',
+        'mutpydep_reference.py': 'import mutpydep_dynamic\nTARGET = mutpydep_dynamic.TARGET',
+    }
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        os.makedirs(os.path.join(self.tmp, 'mutpydep_pkg'))
+        for path, source in self.MODULES.items():
+            with open(os.path.join(self.tmp, path), 'w') as module_file:
+                module_file.write(source)
+        sys.path.insert(0, self.tmp)
+
+    def tearDown(self):
+        sys.path.remove(self.tmp)
+        for name in list(sys.modules):
+            if name.startswith('mutpydep_'):
+                del sys.modules[name]
+        shutil.rmtree(self.tmp)
+
+    def test_get_dependents(self):
+        with utils.ModulesDependencyGraph() as graph:
+            __import__('mutpydep_test')
+
+        self.assertEqual(graph.get_dependents('mutpydep_pkg.target'), {'mutpydep_user', 'mutpydep_test'})
+        self.assertEqual(graph.get_dependents('mutpydep_heavy'), {'mutpydep_test'})
+        self.assertEqual(graph.get_dependents('mutpydep_test'), set())
+        self.assertIn('mutpydep_heavy', graph.modules)
+
+    def test_get_dependents_of_dynamically_imported_module(self):
+        with utils.ModulesDependencyGraph() as graph:
+            __import__('mutpydep_test')
+            __import__('mutpydep_reference')
+
+        self.assertEqual(graph.get_dependents('mutpydep_pkg.target'),
+                         {'mutpydep_user', 'mutpydep_test', 'mutpydep_dynamic', 'mutpydep_reference'})
+        self.assertIs(importlib.import_module, graph.original_import_module)
+
+
 class InjectImporterTest(unittest.TestCase):
 
     def test_inject(self):
@@ -206,6 +425,147 @@ class ParentNodeTransformerTest(unittest.TestCase):
         utils.ParentNodeTransformer().visit(node)
 
         self.assertEqual(node.body[0].op.parent, node.body[0])
-        self.assertIn(node.body[0].op, node.body[0].children)
+        self.assertTrue(utils.is_descendant(node.body[0].op, node.body[0]))
         self.assertEqual(node.body[0].value.op.parent, node.body[0].value)
-        self.assertIn(node.body[0].value.op, node.body[0].value.children)
+        self.assertTrue(utils.is_descendant(node.body[0].value.op, node.body[0].value))
+
+    def test_is_descendant(self):
+        node = utils.create_ast('x = y + z\nw = 1')
+
+        self.assertTrue(utils.is_descendant(node.body[0].value.left, node.body[0]))
+        self.assertTrue(utils.is_descendant(node.body[1].value, node))
+        self.assertFalse(utils.is_descendant(node.body[0], node.body[0]))
+        self.assertFalse(utils.is_descendant(node.body[1].value, node.body[0]))
+        self.assertFalse(utils.is_descendant(node.body[0], node.body[0].value))
+
+
+class MutationSamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.node = utils.create_ast(utils.f("""
+        def f(x):
+            return x + 1 + 2 + 3
+        def g(x):
+            return x + 1
+        """))
+        self.candidates = [('target', 'AOR', 'mutate_Add', node) for node in ast.walk(self.node)
+                           if isinstance(node, ast.Add)]
+        self.candidates += [('target', 'CRP', 'mutate_Num', node) for node in ast.walk(self.node)
+                            if isinstance(node, ast.Constant)]
+
+    def get_sampled(self, sampler):
+        sampler.prepare(self.candidates)
+        return [(operator_name, node.index) for module_name, operator_name, visitor, node in self.candidates
+                if sampler.is_mutation_time(module_name, operator_name, visitor, node)]
+
+    def test_sample_all_if_full_percentage(self):
+        self.assertEqual(len(self.get_sampled(utils.MutationSampler(100))), len(self.candidates))
+
+    def test_same_sample_for_same_seed(self):
+        samples = {tuple(self.get_sampled(utils.MutationSampler(50, seed=seed))) for seed in range(10)}
+
+        self.assertEqual(self.get_sampled(utils.MutationSampler(50, seed=1)),
+                         self.get_sampled(utils.MutationSampler(50, seed=1)))
+        self.assertGreater(len(samples), 1)
+
+    def test_stratified_sample(self):
+        for seed in range(10):
+            sampled = self.get_sampled(utils.MutationSampler(10, seed=seed, strata=['operator', 'function']))
+
+            self.assertEqual(sorted(operator_name for operator_name, _ in sampled), ['AOR', 'AOR', 'CRP', 'CRP'])
+
+    def test_population(self):
+        sampler = utils.MutationSampler(50, strata=['operator'])
+
+        sampler.prepare(self.candidates)
+        sampler.prepare(self.candidates)
+
+        self.assertEqual(sampler.get_population(), {('AOR',): 4, ('CRP',): 4})
+
+
+@utils.TimeRegister
+def registered_task():
+    time.sleep(0.01)
+
+
+class MutationTestWorkerPoolTest(unittest.TestCase):
+
+    @staticmethod
+    def handler(task, context):
+        if task == 'loop':
+            while True:
+                pass
+        if task == 'register':
+            registered_task()
+        if task == 'error':
+            raise ValueError('handler error')
+        return task, os.getpid(), context
+
+    def run_task(self, pool, task, live_time=5, context=None):
+        pool.start(task, task, live_time, context)
+        results = []
+        while not results:
+            results = pool.wait_for_results()
+        return results[0][1]
+
+    def test_reuse_worker(self):
+        pool = utils.MutationTestWorkerPool(size=1, handler=self.handler)
+
+        first_result = self.run_task(pool, 'a')
+        second_result = self.run_task(pool, 'b')
+        pool.close()
+
+        self.assertEqual(first_result[0], 'a')
+        self.assertEqual(second_result[0], 'b')
+        self.assertEqual(first_result[1], second_result[1])
+
+    def test_restart_exhausted_worker(self):
+        pool = utils.MutationTestWorkerPool(size=1, handler=self.handler, max_tasks=1)
+
+        first_result = self.run_task(pool, 'a')
+        second_result = self.run_task(pool, 'b')
+        pool.close()
+
+        self.assertNotEqual(first_result[1], second_result[1])
+
+    def test_timeout(self):
+        pool = utils.MutationTestWorkerPool(size=1, handler=self.handler)
+
+        result = self.run_task(pool, 'loop', live_time=0.1)
+        pool.close()
+
+        self.assertIsNone(result)
+
+    def test_report_handler_error_as_incompetent_and_restart_worker(self):
+        pool = utils.MutationTestWorkerPool(size=1, handler=self.handler)
+
+        first_result = self.run_task(pool, 'a')
+        error_result = self.run_task(pool, 'error')
+        second_result = self.run_task(pool, 'b')
+        pool.close()
+
+        self.assertTrue(error_result.is_incompetent)
+        self.assertIsInstance(error_result.exception, ValueError)
+        self.assertIn('handler error', error_result.exception_traceback)
+        self.assertEqual(second_result[0], 'b')
+        self.assertNotEqual(first_result[1], second_result[1])
+
+    def test_send_context_once(self):
+        pool = utils.MutationTestWorkerPool(size=1, handler=self.handler)
+
+        first_result = self.run_task(pool, 'a', context=('key', 'context'))
+        second_result = self.run_task(pool, 'b', context=('key', 'context'))
+        pool.close()
+
+        self.assertEqual(first_result[2], 'context')
+        self.assertIsNone(second_result[2])
+
+    def test_collect_worker_time_stats(self):
+        utils.TimeRegister.clean()
+        pool = utils.MutationTestWorkerPool(size=1, handler=self.handler)
+
+        self.run_task(pool, 'register')
+        self.run_task(pool, 'register')
+        pool.close()
+
+        self.assertGreaterEqual(utils.TimeRegister.executions['registered_task'], 0.02)
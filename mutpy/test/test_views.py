@@ -1,6 +1,13 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
 import unittest
 
-from mutpy.views import QuietTextView
+from mutpy import operators, utils
+from mutpy.controller import MutationScore
+from mutpy.views import QuietTextView, HTMLReportView, JSONLReportView, SQLiteReportView
 
 COLOR_RED = 'red'
 
@@ -19,3 +26,117 @@ class QuietTextViewTest(unittest.TestCase):
         colored_text = text_view.decorate(text, color=COLOR_RED)
         # then
         self.assertEqual(expected_colored_text, colored_text)
+
+
+class HTMLReportViewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        self.view = HTMLReportView(self.tmp)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_render_detail_when_mutation_ends(self):
+        original_ast = utils.create_ast('x = 1\ny = 2\nz = 3')
+        mutant_ast = utils.create_ast('x = 1\ny = 3\nz = 3')
+        mutation = operators.Mutation(operator=operators.ConstantReplacement, node=mutant_ast.body[1].value)
+        self.view.initialize(['target'], ['test'])
+        self.view.passed([], 0)
+        self.view.original('target', original_ast)
+
+        self.view.mutation(1, [mutation], 'target', mutant_ast)
+        self.view.survived(0.1, 1)
+
+        with open(os.path.join(self.tmp, 'mutants', '1.html')) as detail_file:
+            detail = detail_file.read()
+        self.assertIn('-y = 2\n+y = 3', detail)
+        self.assertIn('survived', detail)
+        mutation_info = self.view.mutation_info[0]
+        self.assertNotIn('mutant', mutation_info)
+        self.assertNotIn('mutant_diff', mutation_info)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'index.html')))
+
+        score = MutationScore()
+        score.inc_survived()
+        self.view.end(score, 1)
+
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, 'index.html')))
+
+
+class JSONLReportViewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        self.path = os.path.join(self.tmp, 'report.jsonl')
+        self.view = JSONLReportView(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def read_records(self):
+        with open(self.path) as report_file:
+            return [json.loads(line) for line in report_file]
+
+    def test_write_mutant_when_finished(self):
+        mutant_ast = utils.create_ast('x = 2')
+        mutation = operators.Mutation(operator=operators.ConstantReplacement, node=mutant_ast.body[0].value)
+        self.view.initialize(['target'], ['test'])
+        self.view.passed([], 0)
+
+        self.view.mutation(1, [mutation], 'target', mutant_ast)
+        self.view.killed(0.1, 'test_x', 'traceback', 1)
+
+        self.assertEqual(self.view.mutation_info, [])
+        records = self.read_records()
+        self.assertEqual([record['type'] for record in records], ['tests', 'mutation'])
+        self.assertEqual(records[1]['status'], 'killed')
+        self.assertEqual(records[1]['mutations'], [{'operator': 'CRP', 'lineno': 1}])
+
+    def test_write_summary_at_end(self):
+        self.view.initialize(['target'], ['test'])
+        self.view.passed([], 0)
+
+        self.view.end(MutationScore(), 1)
+
+        summary = self.read_records()[-1]
+        self.assertEqual(summary['type'], 'summary')
+        self.assertEqual(summary['mutation_score'], 0)
+
+
+class SQLiteReportViewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='mutpytmp-')
+        self.path = os.path.join(self.tmp, 'results.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_view(self, status):
+        view = SQLiteReportView(self.path)
+        mutant_ast = utils.create_ast(utils.f("""
+        class A:
+            def f(self):
+                return 2
+        """))
+        node = mutant_ast.body[0].body[0].body[0].value
+        view.initialize(['target'], ['test'])
+        view.passed([], 0)
+        view.mutation(1, [operators.Mutation(operator=operators.ConstantReplacement, node=node)], 'target', mutant_ast)
+        getattr(view, status)(0.1, tests_run=1, killer='test_f', exception_traceback='traceback')
+        view.end(MutationScore(), 1)
+
+    def test_store_runs(self):
+        self.run_view('survived')
+        self.run_view('killed')
+
+        connection = sqlite3.connect(self.path)
+        self.addCleanup(connection.close)
+        rows = connection.execute(
+            'SELECT mutants.run_id, mutants.status, mutations.operator, mutations.function FROM mutants '
+            'JOIN mutations ON mutations.run_id = mutants.run_id AND mutations.mutant_number = mutants.number '
+            'ORDER BY mutants.run_id'
+        ).fetchall()
+        self.assertEqual(rows, [(1, 'survived', 'CRP', 'A.f'), (2, 'killed', 'CRP', 'A.f')])
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM runs').fetchone(), (2,))
@@ -1,30 +1,76 @@
 import copy
+import dis
+import hashlib
+import math
 import sys
+import builtins
 import importlib
+import importlib.util
 import unittest
 import time
 import pkgutil
 import types
-import random
 import ast
 import re
 import os
+import pickle
+import subprocess
+import traceback
 from _pyio import StringIO
 from collections import defaultdict, namedtuple
-from multiprocessing import Process, Queue
+from multiprocessing import Process, Pipe
+from multiprocessing.connection import wait
 from threading import Thread
 import ctypes
-from queue import Empty
 
 
 def create_module(ast_node, module_name='mutant', module_dict=None):
     code = compile(ast_node, module_name, 'exec')
+    return create_module_from_code(code, module_name, module_dict)
+
+
+def create_module_from_code(code, module_name='mutant', module_dict=None):
     module = types.ModuleType(module_name)
     module.__dict__.update(module_dict or {})
     exec(code, module.__dict__)
     return module
 
 
+CODE_DIGEST_ATTRS = [
+    'co_argcount',
+    'co_posonlyargcount',
+    'co_kwonlyargcount',
+    'co_flags',
+    'co_names',
+    'co_varnames',
+    'co_freevars',
+    'co_cellvars',
+    'co_name',
+    'co_exceptiontable',
+]
+
+
+def get_code_digest(code):
+    digest = hashlib.sha1()
+    update_code_digest(digest, code)
+    return digest.hexdigest()
+
+
+def update_code_digest(digest, code):
+    for attr in CODE_DIGEST_ATTRS:
+        digest.update('{!r}\0'.format(getattr(code, attr, None)).encode())
+    for instruction in dis.get_instructions(code):
+        if isinstance(instruction.argval, types.CodeType):
+            digest.update('{}\0'.format(instruction.opname).encode())
+            update_code_digest(digest, instruction.argval)
+        else:
+            digest.update('{} {}:{!r}\0'.format(
+                instruction.opname,
+                type(instruction.argval).__name__,
+                instruction.argval,
+            ).encode())
+
+
 def notmutate(sth):
     return sth
 
@@ -40,20 +86,54 @@ class ModulesLoaderException(Exception):
 
 
 class ModulesLoader:
+    """Resolves names to modules to mutate or test.
+
+    Resolutions are cached as module names and re-imported on next load, so
+    packages are walked once per session unless any of their files or
+    directories is modified.
+    """
 
     def __init__(self, names, path):
         self.names = names
+        self.resolved = {}
         sys.path.insert(0, path or '.')
 
     def load(self, without_modules=None):
         results = []
         without_modules = without_modules or []
         for name in self.names:
-            results += self.load_single(name)
+            results += self.load_cached(name)
         for module, to_mutate in results:
             if module not in without_modules:
                 yield module, to_mutate
 
+    def load_cached(self, name):
+        if name in self.resolved:
+            resolution, mtimes = self.resolved[name]
+            if not self.is_modified(mtimes):
+                try:
+                    return [(importlib.import_module(module_name), to_mutate) for module_name, to_mutate in resolution]
+                except ImportError:
+                    del self.resolved[name]
+        results = self.load_single(name)
+        resolution = [(module.__name__, to_mutate) for module, to_mutate in results]
+        self.resolved[name] = (resolution, self.get_mtimes(results))
+        return results
+
+    @staticmethod
+    def get_mtimes(results):
+        mtimes = {}
+        for module, _ in results:
+            module_file = getattr(module, '__file__', None)
+            if module_file:
+                for path in (module_file, os.path.dirname(module_file)):
+                    mtimes[path] = get_mtime(path)
+        return mtimes
+
+    @staticmethod
+    def is_modified(mtimes):
+        return any(get_mtime(path) != mtime for path, mtime in mtimes.items())
+
     def load_single(self, name):
         if self.is_file(name):
             return self.load_file(name)
@@ -71,8 +151,6 @@ class ModulesLoader:
             return module.__file__.endswith('__init__.py')
         except ImportError:
             return False
-        finally:
-            sys.path_importer_cache.clear()
 
     def load_file(self, name):
         raise NotImplementedError('File loading is not supported!')
@@ -112,6 +190,49 @@ class ModulesLoader:
         return [(module, '.'.join(to_mutate) if to_mutate else None)]
 
 
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_changed_lines(revision):
+    root = subprocess.check_output(['git', 'rev-parse', '--show-toplevel']).decode().strip()
+    diff = subprocess.check_output(['git', 'diff', '--unified=0', '--no-color', '--no-ext-diff', revision, '--'])
+    return parse_diff(diff.decode(errors='replace'), root)
+
+
+def parse_diff(diff, root):
+    changed_lines = defaultdict(set)
+    file_path = None
+    old_remaining = new_remaining = 0
+    for line in diff.split('\n'):
+        if old_remaining > 0 or new_remaining > 0:
+            if line.startswith('-'):
+                old_remaining -= 1
+            elif line.startswith('+'):
+                new_remaining -= 1
+            elif not line.startswith('\\'):
+                old_remaining -= 1
+                new_remaining -= 1
+        elif line.startswith('+++ '):
+            name = line[4:].strip()
+            if name == '/dev/null':
+                file_path = None
+            else:
+                file_path = os.path.realpath(os.path.join(root, name[2:] if name.startswith('b/') else name))
+        elif line.startswith('@@ '):
+            match = re.match(r'@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@', line)
+            if match:
+                old_remaining = int(match.group(1) or 1)
+                start = int(match.group(2))
+                new_remaining = int(match.group(3) or 1)
+                if file_path:
+                    changed_lines[file_path].update(range(max(start, 1), start + max(new_remaining, 1)))
+    return dict(changed_lines)
+
+
 class InjectImporter:
 
     def __init__(self, module):
@@ -143,6 +264,202 @@ class InjectImporter:
             del sys.meta_path[0]
 
 
+class ReferencesPatcher:
+    """Points kept modules at new versions of reloaded modules.
+
+    Attributes of kept modules and of classes defined in them that refer to
+    a reloaded module or to an object defined in it are replaced by the
+    object of the same name in the new version. Immutable values are
+    matched by name and identity, other values by identity only. Changes
+    are undone by restore.
+    """
+    IMMUTABLE_TYPES = (bool, int, float, complex, str, bytes, tuple, frozenset, type(None))
+
+    def __init__(self):
+        self.objects = {}
+        self.named_values = {}
+        self.changes = []
+
+    def add_module(self, old_module, new_module):
+        self.objects[id(old_module)] = new_module
+        new_values = vars(new_module)
+        for name, value in vars(old_module).items():
+            if name not in new_values or new_values[name] is value:
+                continue
+            if isinstance(value, self.IMMUTABLE_TYPES):
+                self.named_values[name, id(value)] = new_values[name]
+            else:
+                self.objects[id(value)] = new_values[name]
+
+    def get_replacement(self, name, value):
+        if isinstance(value, self.IMMUTABLE_TYPES):
+            return self.named_values.get((name, id(value)), value)
+        return self.objects.get(id(value), value)
+
+    def patch(self, module):
+        for owner in get_namespaces(module):
+            for name, value in list(vars(owner).items()):
+                replacement = self.get_replacement(name, value)
+                if replacement is not value:
+                    self.changes.append((owner, name, value))
+                    setattr(owner, name, replacement)
+
+    def restore(self):
+        while self.changes:
+            owner, name, value = self.changes.pop()
+            setattr(owner, name, value)
+
+    @classmethod
+    def is_patchable(cls, module, replaced_modules):
+        """Check that module does not depend on replaced objects in ways that can't be patched.
+
+        Classes derived from replaced classes, instances of replaced classes
+        and containers of replaced objects are built when the module is
+        executed, so such module has to be executed again.
+        """
+        replaced_ids = {id(module) for module in replaced_modules}
+        replaced_classes = set()
+        for replaced_module in replaced_modules:
+            for value in vars(replaced_module).values():
+                if isinstance(value, type):
+                    replaced_classes.add(value)
+                if not isinstance(value, cls.IMMUTABLE_TYPES):
+                    replaced_ids.add(id(value))
+
+        def is_replaced(value):
+            return id(value) in replaced_ids or type(value) in replaced_classes
+
+        for owner in get_namespaces(module):
+            for value in vars(owner).values():
+                if isinstance(value, type):
+                    if value.__module__ == module.__name__ and \
+                            any(base in replaced_classes for base in value.__mro__[1:]):
+                        return False
+                elif isinstance(value, dict):
+                    if any(is_replaced(item) for item in list(value.keys()) + list(value.values())):
+                        return False
+                elif isinstance(value, (list, tuple, set, frozenset)):
+                    if any(is_replaced(item) for item in value):
+                        return False
+                elif type(value) in replaced_classes:
+                    return False
+        return True
+
+
+def get_namespaces(module):
+    namespaces = [module]
+    for value in list(vars(module).values()):
+        if isinstance(value, type) and value.__module__ == module.__name__:
+            namespaces.append(value)
+    return namespaces
+
+
+class ModulesDependencyGraph:
+    """Records which modules import which while it is active.
+
+    Every import statement executed in this time is recorded as an edge
+    from the importing module to the imported module (and its parent
+    packages and submodules from the from-list). Modules loaded or imported
+    with `importlib.import_module` are recorded as imported by all modules
+    executing on the stack, and modules holding references to other modules
+    (or their classes and functions) are recorded as their importers.
+    """
+
+    def __init__(self):
+        self.imports = defaultdict(set)
+        self.modules = set()
+        self.initial_modules = set()
+        self.original_import = None
+        self.original_import_module = None
+        self.active = False
+
+    def __enter__(self):
+        self.initial_modules = set(sys.modules)
+        self.original_import = builtins.__import__
+        self.original_import_module = importlib.import_module
+        builtins.__import__ = self.record_import
+        importlib.import_module = self.record_import_module
+        sys.meta_path.insert(0, self)
+        self.active = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.active = False
+        sys.meta_path.remove(self)
+        importlib.import_module = self.original_import_module
+        builtins.__import__ = self.original_import
+        self.modules = set(sys.modules)
+        self.record_references()
+
+    def record_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module = self.original_import(name, globals, locals, fromlist, level)
+        importer = globals.get('__name__') if globals else None
+        if importer:
+            try:
+                imported = name
+                if level:
+                    imported = importlib.util.resolve_name('.' * level + name, globals.get('__package__'))
+            except (ImportError, ValueError):
+                return module
+            self.add_import(importer, imported)
+            for item in fromlist or ():
+                submodule = '{}.{}'.format(imported, item)
+                if submodule in sys.modules:
+                    self.imports[importer].add(submodule)
+        return module
+
+    def record_import_module(self, name, package=None):
+        module = self.original_import_module(name, package)
+        if self.active:
+            self.add_stack_imports(module.__name__)
+        return module
+
+    def find_spec(self, fullname, path=None, target=None):
+        self.add_stack_imports(fullname)
+        return None
+
+    def add_stack_imports(self, imported):
+        frame = sys._getframe(1)
+        while frame is not None:
+            importer = frame.f_globals.get('__name__')
+            if importer and importer != imported and importer not in self.initial_modules:
+                self.add_import(importer, imported)
+            frame = frame.f_back
+
+    def add_import(self, importer, imported):
+        parts = imported.split('.')
+        for index in range(1, len(parts) + 1):
+            self.imports[importer].add('.'.join(parts[:index]))
+
+    def record_references(self):
+        for name in self.modules - self.initial_modules:
+            module = sys.modules.get(name)
+            for value in list(getattr(module, '__dict__', {}).values()):
+                if isinstance(value, types.ModuleType):
+                    referenced = value.__name__
+                elif isinstance(value, (type, types.FunctionType)):
+                    referenced = value.__module__
+                else:
+                    continue
+                if isinstance(referenced, str) and referenced in sys.modules and referenced != name and \
+                        not referenced.startswith(name + '.'):
+                    self.add_import(name, referenced)
+
+    def get_dependents(self, module_name):
+        importers = defaultdict(set)
+        for importer, imported_modules in self.imports.items():
+            for imported in imported_modules:
+                importers[imported].add(importer)
+        dependents = set()
+        to_visit = [module_name]
+        while to_visit:
+            for importer in importers[to_visit.pop()]:
+                if importer not in dependents:
+                    dependents.add(importer)
+                    to_visit.append(importer)
+        return dependents
+
+
 class StdoutManager:
 
     def __init__(self, disable=True):
@@ -168,6 +485,24 @@ SerializableMutationTestResult = namedtuple(
 )
 
 
+class TimedTestResult(unittest.TestResult):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = {}
+        self.test_ids = {}
+        self.timer = None
+
+    def startTest(self, test):
+        super().startTest(test)
+        self.timer = Timer()
+
+    def stopTest(self, test):
+        self.durations[test.id()] = self.timer.stop()
+        self.test_ids[str(test)] = test.id()
+        super().stopTest(test)
+
+
 class MutationTestResult(unittest.TestResult):
 
     def __init__(self, *args, coverage_injector=None, **kwargs):
@@ -256,13 +591,87 @@ class TimeRegister:
         cls.stack = []
 
 
-class RandomSampler:
+class MutationSampler:
+    """Deterministic mutation sampling.
 
-    def __init__(self, percentage):
-        self.percentage = percentage if 0 < percentage < 100 else 100
+    Each candidate gets a pseudo random rank computed from seed, module,
+    operator, visitor and node position, so the same mutants are selected in
+    every run and on every worker. With strata the percentage is a quota
+    applied to each group of module candidates separately (at least one
+    mutant from group), instead of to all of them.
+    """
+    STRATA = ['operator', 'module', 'function']
 
-    def is_mutation_time(self):
-        return random.randrange(100) < self.percentage
+    def __init__(self, percentage, seed=0, strata=()):
+        self.percentage = percentage if 0 < percentage < 100 else 100
+        self.seed = seed
+        self.strata = list(strata)
+        self.thresholds = {}
+        self.population = {}
+
+    def is_sampling(self):
+        return self.percentage < 100
+
+    def get_rank(self, module_name, operator_name, visitor, node):
+        key = '{}:{}:{}:{}:{}'.format(self.seed, module_name, operator_name, visitor, getattr(node, 'index', None))
+        return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], 'big') / 2 ** 64
+
+    def get_stratum(self, module_name, operator_name, node):
+        stratum = []
+        for name in self.strata:
+            if name == 'operator':
+                stratum.append(operator_name)
+            elif name == 'module':
+                stratum.append(module_name)
+            elif name == 'function':
+                stratum.append(self.get_function_index(node))
+        return tuple(stratum)
+
+    @staticmethod
+    def get_function_index(node):
+        while node is not None:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                return getattr(node, 'index', None)
+            node = getattr(node, 'parent', None)
+        return None
+
+    def prepare(self, candidates):
+        if not self.is_sampling():
+            return
+        ranks = defaultdict(list)
+        for module_name, operator_name, visitor, node in candidates:
+            stratum = self.get_stratum(module_name, operator_name, node)
+            ranks[module_name, stratum].append(self.get_rank(module_name, operator_name, visitor, node))
+        for key, stratum_ranks in ranks.items():
+            self.population[key] = len(stratum_ranks)
+            if self.strata:
+                stratum_ranks.sort()
+                self.thresholds[key] = stratum_ranks[self.get_quota(len(stratum_ranks)) - 1]
+
+    def get_quota(self, size, percentage=None):
+        percentage = self.percentage if percentage is None else percentage
+        return max(1, math.ceil(size * percentage / 100))
+
+    def get_strata_sizes(self, candidates):
+        sizes = defaultdict(int)
+        for module_name, operator_name, _, node in candidates:
+            sizes[module_name, self.get_stratum(module_name, operator_name, node)] += 1
+        return dict(sizes)
+
+    def get_population(self):
+        population = defaultdict(int)
+        for (_, stratum), size in self.population.items():
+            population[stratum] += size
+        return dict(population)
+
+    def is_mutation_time(self, module_name=None, operator_name=None, visitor=None, node=None):
+        if not self.is_sampling():
+            return True
+        rank = self.get_rank(module_name, operator_name, visitor, node)
+        threshold = self.thresholds.get((module_name, self.get_stratum(module_name, operator_name, node)))
+        if threshold is None:
+            return rank < self.percentage / 100
+        return rank <= threshold
 
 
 class MutationTestRunner:
@@ -281,16 +690,18 @@ class MutationTestRunnerProcess(MutationTestRunner, Process):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.queue = Queue()
+        self.connection, self.child_connection = Pipe(duplex=False)
 
     def get_result(self, live_time):
         try:
-            return self.queue.get(timeout=live_time)
-        except Empty:
-            return None
+            if self.connection.poll(live_time):
+                return self.connection.recv()
+        except EOFError:
+            pass
+        return None
 
     def set_result(self, result):
-        self.queue.put_nowait(result.serialize())
+        self.child_connection.send(result.serialize())
 
 
 class MutationTestRunnerThread(MutationTestRunner, Thread):
@@ -325,20 +736,160 @@ def get_mutation_test_runner_class():
         return MutationTestRunnerProcess
 
 
+class MutationTestWorker(Process):
+
+    def __init__(self, handler, max_tasks=None):
+        super().__init__()
+        self.daemon = True
+        self.handler = handler
+        self.max_tasks = max_tasks
+        self.tasks_number = 0
+        self.context_key = None
+        self.failed = False
+        self.connection, self.worker_connection = Pipe()
+
+    def run(self):
+        self.connection.close()
+        TimeRegister.clean()
+        try:
+            while not self.failed:
+                try:
+                    context, task = self.worker_connection.recv()
+                except EOFError:
+                    break
+                try:
+                    result = self.handler(task, context)
+                except Exception as exception:
+                    self.failed = True
+                    result = self.get_error_result(exception)
+                self.worker_connection.send((result, dict(TimeRegister.executions), self.failed))
+                TimeRegister.clean()
+        except KeyboardInterrupt:
+            pass
+
+    @staticmethod
+    def get_error_result(exception):
+        try:
+            pickle.dumps(exception)
+        except Exception:
+            exception = RuntimeError(''.join(traceback.format_exception_only(type(exception), exception)).strip())
+        return SerializableMutationTestResult(
+            is_incompetent=True,
+            is_survived=False,
+            killer=None,
+            exception_traceback=traceback.format_exc(),
+            exception=exception,
+            tests_run=0,
+        )
+
+    def send(self, task, context=None):
+        self.tasks_number += 1
+        if context is None:
+            self.context_key = None
+            self.connection.send((None, task))
+        elif context[0] == self.context_key:
+            self.connection.send((None, task))
+        else:
+            self.context_key = context[0]
+            self.connection.send((context[1], task))
+
+    def get_result(self):
+        try:
+            result, executions, self.failed = self.connection.recv()
+        except EOFError:
+            return None
+        for name, duration in executions.items():
+            TimeRegister.executions[name] += duration
+        return result
+
+    def is_exhausted(self):
+        return bool(self.max_tasks) and self.tasks_number >= self.max_tasks
+
+    def stop(self):
+        self.connection.close()
+        self.terminate()
+        self.join()
+
+
+class MutationTestWorkerPool:
+
+    def __init__(self, size, handler, max_tasks=None):
+        self.size = size
+        self.handler = handler
+        self.max_tasks = max_tasks
+        self.idle_workers = []
+        self.busy_workers = {}
+
+    def is_full(self):
+        return len(self.busy_workers) >= self.size
+
+    def get_worker(self, context_key=None):
+        for worker in self.idle_workers:
+            if context_key is not None and worker.context_key == context_key:
+                self.idle_workers.remove(worker)
+                return worker
+        if self.idle_workers:
+            return self.idle_workers.pop()
+        worker = MutationTestWorker(self.handler, self.max_tasks)
+        worker.start()
+        worker.worker_connection.close()
+        return worker
+
+    def start(self, key, task, live_time, context=None):
+        worker = self.get_worker(context[0] if context else None)
+        timer = Timer()
+        worker.send(task, context)
+        self.busy_workers[key] = (worker, timer, live_time)
+
+    def wait_for_results(self):
+        if not self.busy_workers:
+            return []
+        deadline = min(timer.start + live_time for _, timer, live_time in self.busy_workers.values())
+        ready = wait([worker.connection for worker, _, _ in self.busy_workers.values()],
+                     timeout=max(0, deadline - Timer.time_provider()))
+        finished = []
+        for key, (worker, timer, live_time) in list(self.busy_workers.items()):
+            if worker.connection in ready:
+                result = worker.get_result()
+            elif Timer.time_provider() - timer.start >= live_time:
+                result = None
+            else:
+                continue
+            timer.stop()
+            del self.busy_workers[key]
+            if result is None or worker.failed or worker.is_exhausted():
+                worker.stop()
+            else:
+                self.idle_workers.append(worker)
+            finished.append((key, result, timer.duration))
+        return finished
+
+    def close(self):
+        for worker in self.idle_workers + [worker for worker, _, _ in self.busy_workers.values()]:
+            worker.stop()
+        self.idle_workers = []
+        self.busy_workers.clear()
+
+
 class ParentNodeTransformer(ast.NodeTransformer):
 
+    def __init__(self):
+        super().__init__()
+        self.parent = None
+        self.next_index = 0
+
     def visit(self, node):
         if getattr(node, 'parent', None):
             node = copy.copy(node)
             if hasattr(node, 'lineno'):
                 del node.lineno
-        node.parent = getattr(self, 'parent', None)
-        node.children = []
+        node.parent = self.parent
+        node.index = self.next_index
+        self.next_index += 1
         self.parent = node
         result_node = super().visit(node)
         self.parent = node.parent
-        if self.parent:
-            self.parent.children += [node] + node.children
+        node.end_index = self.next_index
         return result_node
 
 
@@ -346,6 +897,10 @@ def create_ast(code):
     return ParentNodeTransformer().visit(ast.parse(code))
 
 
+def is_descendant(node, ancestor):
+    return ancestor.index < node.index < ancestor.end_index
+
+
 def is_docstring(node):
     def_node = node.parent.parent
     return (isinstance(def_node, (ast.FunctionDef, ast.ClassDef, ast.Module)) and def_node.body and
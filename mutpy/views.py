@@ -1,9 +1,18 @@
 import os
+import ast
+import difflib
+import json
+import sqlite3
+import time
 import traceback
 import datetime
 import yaml
 import jinja2
-from mutpy import codegen, termcolor, utils
+from mutpy import codegen, journal, termcolor, utils
+
+
+def get_mutant_source(mutant):
+    return mutant if isinstance(mutant, str) else codegen.to_source(mutant)
 
 
 class ViewNotifier:
@@ -97,6 +106,12 @@ class TextView(QuietTextView):
                                                                 100 * score.incompetent_mutants / score.all_mutants), 2)
             self.level_print('timeout: {} ({:.1f}%)'.format(score.timeout_mutants,
                                                             100 * score.timeout_mutants / score.all_mutants), 2)
+            if score.equivalent_mutants:
+                self.level_print('equivalent: {}'.format(score.equivalent_mutants), 2)
+            confidence_interval = score.get_confidence_interval()
+            if confidence_interval:
+                self.level_print('sampled score 95% confidence interval: {:.1f}% - {:.1f}%'.format(
+                    *confidence_interval), 2)
             if score.all_nodes:
                 self.level_print('Coverage: {} of {} AST nodes ({:.1f}%)'.format(
                     score.covered_nodes, score.all_nodes,
@@ -135,7 +150,7 @@ class TextView(QuietTextView):
                          exception.__class__.__name__, exception))
 
     def print_code(self, mutant, lineno):
-        mutant_src = codegen.to_source(mutant)
+        mutant_src = get_mutant_source(mutant)
         mutant_src = codegen.add_line_numbers(mutant_src)
         src_lines = mutant_src.split("\n")
         lineno = min(lineno, len(src_lines))
@@ -156,6 +171,9 @@ class TextView(QuietTextView):
     def incompetent(self, time, *args, **kwargs):
         self.level_print(self.time_format(time) + ' ' + self.decorate('incompetent', 'cyan'), continuation=True)
 
+    def equivalent(self, *args, **kwargs):
+        self.level_print(self.time_format() + ' ' + self.decorate('equivalent', 'magenta'), continuation=True)
+
 
 class DebugView:
 
@@ -207,6 +225,9 @@ class AccReportView:
     def timeout(self, time, *args, **kwargs):
         self.end_mutation('timeout', time=time)
 
+    def equivalent(self, *args, **kwargs):
+        self.end_mutation('equivalent')
+
     def end_mutation(self, status, time=None, killer=None, tests_run=None, exception_traceback=None):
         self.current_mutation['status'] = status
         self.current_mutation['time'] = time
@@ -215,6 +236,49 @@ class AccReportView:
         self.current_mutation['exception_traceback'] = exception_traceback
         self.mutation_info.append(self.current_mutation)
 
+    def get_tests_report(self):
+        return {
+            'targets': self.target,
+            'tests': [{'name': test.__name__, 'target': target, 'time': time} for test, target, time in self.tests],
+            'number_of_tests': self.number_of_tests,
+        }
+
+    def get_score_report(self, score, duration):
+        return {
+            'total_time': duration,
+            'time_stats': dict(utils.TimeRegister.executions),
+            'mutation_score': score.count(),
+            'mutation_score_confidence_interval': list(score.get_confidence_interval() or []) or None,
+            'equivalent_mutants': score.equivalent_mutants,
+            'coverage': {
+                'covered_nodes': score.covered_nodes,
+                'all_nodes': score.all_nodes,
+            }
+        }
+
+
+class JournalView(AccReportView):
+
+    def __init__(self, mutation_journal):
+        super().__init__()
+        self.mutation_journal = mutation_journal
+
+    def mutation(self, number, mutations, module, mutant):
+        super().mutation(number, mutations, module, mutant)
+        for mutation_info, mutation in zip(self.current_mutation['mutations'], mutations):
+            mutation_info['visitor'], mutation_info['node'] = journal.get_mutation_key(mutation)[1:]
+
+    def incompetent(self, time, exception, tests_run, *args, **kwargs):
+        self.current_mutation['exception'] = ''.join(traceback.format_exception_only(type(exception), exception))
+        super().incompetent(time, exception, tests_run, *args, **kwargs)
+
+    def end_mutation(self, *args, **kwargs):
+        super().end_mutation(*args, **kwargs)
+        self.mutation_journal.append(self.mutation_info.pop())
+
+    def end(self, score, duration):
+        self.mutation_journal.close()
+
 
 class YAMLReportView(AccReportView):
 
@@ -223,45 +287,157 @@ class YAMLReportView(AccReportView):
         self.file_name = file_name
 
     def end(self, score, duration):
+        report = self.get_tests_report()
+        report['mutations'] = self.mutation_info
+        report.update(self.get_score_report(score, duration))
         with open(self.file_name, 'w') as report_file:
-            yaml.dump({
-                'targets': self.target,
-                'tests': [{'name': test.__name__, 'target': target, 'time': time} for test, target, time in self.tests],
-                'number_of_tests': self.number_of_tests,
-                'mutations': self.mutation_info,
-                'total_time': duration,
-                'time_stats': dict(utils.TimeRegister.executions),
-                'mutation_score': score.count(),
-                'coverage': {
-                    'covered_nodes': score.covered_nodes,
-                    'all_nodes': score.all_nodes,
-                }
-            }, report_file, default_flow_style=False)
+            yaml.dump(report, report_file, default_flow_style=False)
+
+
+class JSONLReportView(AccReportView):
+
+    def __init__(self, file_name):
+        super().__init__()
+        self.report_file = open(file_name, 'w')
+
+    def write(self, record_type, record):
+        record['type'] = record_type
+        self.report_file.write(json.dumps(record) + '\n')
+        self.report_file.flush()
+
+    def passed(self, tests, number_of_tests):
+        super().passed(tests, number_of_tests)
+        self.write('tests', self.get_tests_report())
+
+    def end_mutation(self, *args, **kwargs):
+        super().end_mutation(*args, **kwargs)
+        self.write('mutation', self.mutation_info.pop())
+
+    def end(self, score, duration):
+        self.write('summary', self.get_score_report(score, duration))
+        self.report_file.close()
+
+
+class SQLiteReportView(AccReportView):
+    COMMIT_INTERVAL = 100
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, started REAL, targets TEXT, number_of_tests INTEGER, '
+        'total_time REAL, mutation_score REAL, equivalent_mutants INTEGER, covered_nodes INTEGER, all_nodes INTEGER)',
+        'CREATE TABLE IF NOT EXISTS tests (run_id INTEGER, name TEXT, target TEXT, time REAL)',
+        'CREATE TABLE IF NOT EXISTS mutants (run_id INTEGER, number INTEGER, module TEXT, status TEXT, time REAL, '
+        'killer TEXT, tests_run INTEGER, exception_traceback TEXT, PRIMARY KEY (run_id, number))',
+        'CREATE TABLE IF NOT EXISTS mutations (run_id INTEGER, mutant_number INTEGER, operator TEXT, lineno INTEGER, '
+        'function TEXT)',
+        'CREATE TABLE IF NOT EXISTS time_stats (run_id INTEGER, name TEXT, time REAL)',
+        'CREATE INDEX IF NOT EXISTS mutants_status ON mutants (status, module)',
+        'CREATE INDEX IF NOT EXISTS mutations_mutant ON mutations (run_id, mutant_number)',
+        'CREATE INDEX IF NOT EXISTS mutations_function ON mutations (function)',
+    ]
+
+    def __init__(self, file_name):
+        super().__init__()
+        self.connection = sqlite3.connect(file_name)
+        for statement in self.SCHEMA:
+            self.connection.execute(statement)
+        self.run_id = None
+        self.uncommitted = 0
+
+    def initialize(self, target, tests):
+        super().initialize(target, tests)
+        cursor = self.connection.execute('INSERT INTO runs (started, targets) VALUES (?, ?)',
+                                         (time.time(), json.dumps(target)))
+        self.run_id = cursor.lastrowid
+        self.connection.commit()
+
+    def passed(self, tests, number_of_tests):
+        super().passed(tests, number_of_tests)
+        self.connection.execute('UPDATE runs SET number_of_tests = ? WHERE id = ?', (number_of_tests, self.run_id))
+        self.connection.executemany(
+            'INSERT INTO tests (run_id, name, target, time) VALUES (?, ?, ?, ?)',
+            [(self.run_id, test.__name__, target, test_time) for test, target, test_time in tests],
+        )
+        self.connection.commit()
+
+    def mutation(self, number, mutations, module, mutant):
+        super().mutation(number, mutations, module, mutant)
+        for mutation_info, mutation in zip(self.current_mutation['mutations'], mutations):
+            mutation_info['function'] = self.get_function_name(mutation.node)
+
+    @staticmethod
+    def get_function_name(node):
+        names = []
+        while node is not None:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.append(node.name)
+            node = getattr(node, 'parent', None)
+        return '.'.join(reversed(names)) or None
+
+    def end_mutation(self, *args, **kwargs):
+        super().end_mutation(*args, **kwargs)
+        mutation = self.mutation_info.pop()
+        self.connection.execute(
+            'INSERT INTO mutants (run_id, number, module, status, time, killer, tests_run, exception_traceback) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (self.run_id, mutation['number'], mutation['module'], mutation['status'], mutation['time'],
+             mutation['killer'], mutation['tests_run'], mutation['exception_traceback']),
+        )
+        self.connection.executemany(
+            'INSERT INTO mutations (run_id, mutant_number, operator, lineno, function) VALUES (?, ?, ?, ?, ?)',
+            [(self.run_id, mutation['number'], mutation_info['operator'], mutation_info['lineno'],
+              mutation_info['function']) for mutation_info in mutation['mutations']],
+        )
+        self.uncommitted += 1
+        if self.uncommitted >= self.COMMIT_INTERVAL:
+            self.connection.commit()
+            self.uncommitted = 0
+
+    def end(self, score, duration):
+        self.connection.execute(
+            'UPDATE runs SET total_time = ?, mutation_score = ?, equivalent_mutants = ?, covered_nodes = ?, '
+            'all_nodes = ? WHERE id = ?',
+            (duration, score.count(), score.equivalent_mutants, score.covered_nodes, score.all_nodes, self.run_id),
+        )
+        self.connection.executemany(
+            'INSERT INTO time_stats (run_id, name, time) VALUES (?, ?, ?)',
+            [(self.run_id, name, stat_time) for name, stat_time in utils.TimeRegister.executions.items()],
+        )
+        self.connection.commit()
+        self.connection.close()
 
 
 class HTMLReportView(AccReportView):
+    DIFF_CONTEXT = 5
 
     def __init__(self, dir_name):
         super().__init__()
         self.dir_name = dir_name
+        self.original_sources = {}
         os.makedirs(dir_name, exist_ok=True)
         os.makedirs(os.path.join(dir_name, 'mutants'), exist_ok=True)
         templates_path = os.path.join(os.path.dirname(__file__), 'templates')
         self.env = jinja2.Environment(loader=jinja2.FileSystemLoader(searchpath=templates_path))
 
+    def original(self, module, target_ast):
+        self.original_sources[module] = codegen.to_source(target_ast).split('\n')
+
     def mutation(self, number, mutations, module, mutant):
         super().mutation(number, mutations, module, mutant)
-        self.current_mutation['mutant'] = mutant
+        self.current_mutation['mutant_diff'] = self.get_mutant_diff(module, mutant)
+
+    def get_mutant_diff(self, module, mutant):
+        mutant_lines = get_mutant_source(mutant).split('\n')
+        original_lines = self.original_sources.get(module, [])
+        return '\n'.join(difflib.unified_diff(original_lines, mutant_lines, n=self.DIFF_CONTEXT, lineterm=''))
 
     def end_mutation(self, *args, **kwargs):
         super().end_mutation(*args, **kwargs)
+        self.render_detail(self.current_mutation)
+        del self.current_mutation['mutant_diff']
+
+    def render_detail(self, mutation):
         template = self.env.get_template('detail.html')
-        context = {
-            'mutant_code': codegen.to_source(self.current_mutation['mutant']),
-        }
-        context.update(self.current_mutation)
-        report = template.render(context)
-        file_path = os.path.join(self.dir_name, 'mutants', '{}.html'.format(self.current_mutation['number']))
+        report = template.render(mutation)
+        file_path = os.path.join(self.dir_name, 'mutants', '{}.html'.format(mutation['number']))
         with open(file_path, 'w') as report_file:
             report_file.write(report)
 